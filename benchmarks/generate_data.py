@@ -0,0 +1,524 @@
+import argparse
+import logging
+import math
+import os
+import tempfile
+from typing import Dict
+
+import duckdb
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SEED_DATA_PATH = os.path.join(BENCHMARKS_DIR, "..", "seed_data.sql")
+SOURCE_PATH = os.path.join(BENCHMARKS_DIR, "data", "source.duckdb")
+
+# Size of the seed fixture, i.e. scale factor 1.
+SEED_ORDERS = 5009
+SEED_CUSTOMERS = 793
+SEED_PRODUCTS = 1862
+
+# Number of slots weighted lookups are spread over; a value with weight w gets about
+# w * WEIGHT_SLOTS / total slots, so a random slot picks it with probability w / total.
+WEIGHT_SLOTS = 10_000
+
+
+def load_seed(conn: duckdb.DuckDBPyConnection, seed_path: str) -> None:
+    """
+    Loads seed_data.sql into the seed schema, the reference for every distribution.
+    """
+    logging.info(f"Loading seed data from {seed_path}...")
+    with open(seed_path) as f:
+        script = f.read()
+    conn.execute("CREATE SCHEMA seed;")
+    conn.execute(script.replace('"public".', "seed."))
+
+
+def create_macros(conn: duckdb.DuckDBPyConnection, random_seed: int) -> None:
+    """
+    Creates deterministic random number macros. Values are derived from hashes of a
+    row number and a salt, so the output only depends on the random seed and the
+    scale factor, not on thread scheduling.
+    """
+    conn.execute(
+        f"""
+        CREATE MACRO uniform(i, salt) AS
+            ((hash(i, salt, {random_seed}) % 1000000007) + 0.5) / 1000000007;
+        CREATE MACRO normal(i, salt) AS
+            sqrt(-2 * ln(uniform(i, salt || '_r'))) * cos(2 * pi() * uniform(i, salt || '_t'));
+        CREATE MACRO pick(i, salt, n) AS hash(i, salt, {random_seed}) % n;
+        -- Zipf-like rank in [1, n]: rank k is drawn with probability ~ k^-s.
+        CREATE MACRO zipf(i, salt, n, s) AS
+            least(n, floor(pow((pow(n, 1 - s) - 1) * uniform(i, salt) + 1, 1 / (1 - s))))::BIGINT;
+        """
+    )
+
+
+def create_weighted(conn: duckdb.DuckDBPyConnection, name: str, query: str) -> int:
+    """
+    Materializes the rows of a query with a weight column as a slot table, so
+    weighted sampling becomes an equi-join on a random slot number.
+
+    Returns:
+        int: The number of slots.
+    """
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE {name} AS
+        WITH weighted AS ({query}),
+        slots AS (
+            SELECT
+                * EXCLUDE (weight),
+                unnest(range(greatest(1, round(
+                    weight * {WEIGHT_SLOTS} / sum(weight) OVER ()
+                )::BIGINT))) AS copy
+            FROM weighted
+        )
+        SELECT (row_number() OVER () - 1)::BIGINT AS slot, * EXCLUDE (copy)
+        FROM slots;
+        """
+    )
+    return conn.execute(f"SELECT COUNT(*) FROM {name};").fetchone()[0]
+
+
+def generate(
+    conn: duckdb.DuckDBPyConnection,
+    scale_factor: float,
+    customer_skew: float,
+    product_skew: float,
+    return_skew: float,
+) -> Dict[str, int]:
+    """
+    Generates orders, returns and managers at a scale factor of the seed data, in
+    the temp tables gen_orders, gen_returns and gen_managers.
+
+    Customers and orders grow linearly with the scale factor, the product catalog
+    with its square root. Locations, categories, ship modes, quantities, prices,
+    margins and lines per order follow the seed. Orders are spread over customers and
+    lines over products with a Zipf-like skew, and every customer has its own return
+    propensity, lognormally spread around the seed return rate.
+
+    Returns:
+        Dict[str, int]: The number of rows generated per table.
+    """
+    n_orders = max(1, round(SEED_ORDERS * scale_factor))
+    n_customers = max(1, round(SEED_CUSTOMERS * scale_factor))
+    n_products = max(1, round(SEED_PRODUCTS * math.sqrt(scale_factor)))
+
+    n_locations = create_weighted(
+        conn,
+        "location_slots",
+        """
+        SELECT country, city, state, postal_code, region, COUNT(*) AS weight
+        FROM seed.orders
+        GROUP BY ALL
+        """,
+    )
+    n_segments = create_weighted(
+        conn,
+        "segment_slots",
+        """
+        SELECT segment, COUNT(DISTINCT customer_id) AS weight
+        FROM seed.orders
+        GROUP BY ALL
+        """,
+    )
+    n_ship_modes = create_weighted(
+        conn,
+        "ship_mode_slots",
+        """
+        SELECT
+            ship_mode,
+            MIN(ship_date - order_date) AS min_days,
+            MAX(ship_date - order_date) AS max_days,
+            COUNT(DISTINCT order_id) AS weight
+        FROM seed.orders
+        GROUP BY ALL
+        """,
+    )
+    n_quantities = create_weighted(
+        conn,
+        "quantity_slots",
+        "SELECT quantity, COUNT(*) AS weight FROM seed.orders GROUP BY ALL",
+    )
+    n_sub_categories = create_weighted(
+        conn,
+        "sub_category_slots",
+        """
+        SELECT
+            category,
+            sub_category,
+            AVG(ln(sales / quantity)) AS price_mu,
+            STDDEV(ln(sales / quantity)) AS price_sigma,
+            SUM(profit) / SUM(sales) AS margin_mu,
+            STDDEV(profit / sales) AS margin_sigma,
+            COUNT(DISTINCT product_id) AS weight
+        FROM seed.orders
+        WHERE sales > 0 AND quantity > 0
+        GROUP BY ALL
+        """,
+    )
+    n_lines_slots = create_weighted(
+        conn,
+        "lines_slots",
+        """
+        SELECT lines, COUNT(*) AS weight
+        FROM (SELECT COUNT(*) AS lines FROM seed.orders GROUP BY order_id)
+        GROUP BY ALL
+        """,
+    )
+    date_range = conn.execute(
+        "SELECT MIN(order_date), MAX(order_date) - MIN(order_date) FROM seed.orders;"
+    ).fetchone()
+    return_rate = conn.execute(
+        """
+        SELECT COUNT(DISTINCT r.order_id) / COUNT(DISTINCT o.order_id)
+        FROM seed.orders o
+        LEFT JOIN seed.returns r ON o.order_id = r.order_id;
+        """
+    ).fetchone()[0]
+
+    logging.info(
+        f"Generating {n_customers:,} customers and {n_products:,} products "
+        f"(scale factor {scale_factor})..."
+    )
+    conn.execute(
+        """
+        CREATE TEMP TABLE first_names AS
+        SELECT (row_number() OVER (ORDER BY name) - 1)::BIGINT AS i, name
+        FROM (SELECT DISTINCT split_part(customer_name, ' ', 1) AS name FROM seed.orders);
+
+        CREATE TEMP TABLE last_names AS
+        SELECT (row_number() OVER (ORDER BY name) - 1)::BIGINT AS i, name
+        FROM (
+            SELECT DISTINCT regexp_extract(customer_name, '(\\S+)$', 1) AS name
+            FROM seed.orders
+        );
+
+        CREATE TEMP TABLE seed_products AS
+        SELECT
+            sub_category,
+            (row_number() OVER (PARTITION BY sub_category ORDER BY product_name) - 1)::BIGINT AS i,
+            product_name
+        FROM (SELECT DISTINCT sub_category, product_name FROM seed.orders);
+        """
+    )
+    n_first = conn.execute("SELECT COUNT(*) FROM first_names;").fetchone()[0]
+    n_last = conn.execute("SELECT COUNT(*) FROM last_names;").fetchone()[0]
+
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE gen_customers AS
+        WITH customers AS (
+            SELECT
+                range + 1 AS customer_no,
+                pick(range, 'first_name', {n_first}) AS first_i,
+                pick(range, 'last_name', {n_last}) AS last_i,
+                pick(range, 'segment', {n_segments}) AS segment_slot,
+                -- Lognormal with mean 1, so the average return rate stays the seed's.
+                least(
+                    0.9,
+                    {return_rate} * exp(
+                        {return_skew} * normal(range, 'return')
+                        - {return_skew} * {return_skew} / 2
+                    )
+                ) AS return_rate
+            FROM range({n_customers})
+        )
+        SELECT
+            c.customer_no,
+            upper(left(f.name, 1) || left(l.name, 1)) || '-' || (10000 + c.customer_no) AS customer_id,
+            f.name || ' ' || l.name AS customer_name,
+            s.segment,
+            c.return_rate
+        FROM customers c
+        JOIN first_names f ON c.first_i = f.i
+        JOIN last_names l ON c.last_i = l.i
+        JOIN segment_slots s ON c.segment_slot = s.slot;
+        """
+    )
+
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE gen_products AS
+        WITH products AS (
+            SELECT
+                range + 1 AS product_no,
+                s.category,
+                s.sub_category,
+                exp(s.price_mu + s.price_sigma * normal(range, 'price')) AS unit_price,
+                s.margin_mu,
+                s.margin_sigma,
+                (row_number() OVER (PARTITION BY s.sub_category ORDER BY range) - 1) AS sub_i
+            FROM range({n_products})
+            JOIN sub_category_slots s ON pick(range, 'sub_category', {n_sub_categories}) = s.slot
+        ),
+        seed_counts AS (
+            SELECT sub_category, COUNT(*) AS n FROM seed_products GROUP BY ALL
+        )
+        SELECT
+            p.product_no,
+            upper(left(p.category, 3)) || '-' || upper(left(p.sub_category, 2))
+                || '-' || (10000000 + p.product_no) AS product_id,
+            p.category,
+            p.sub_category,
+            sp.product_name || CASE
+                WHEN p.sub_i >= c.n THEN ' #' || (p.sub_i // c.n + 1)
+                ELSE ''
+            END AS product_name,
+            round(p.unit_price, 2) AS unit_price,
+            p.margin_mu,
+            p.margin_sigma
+        FROM products p
+        JOIN seed_counts c ON p.sub_category = c.sub_category
+        JOIN seed_products sp
+            ON p.sub_category = sp.sub_category AND p.sub_i % c.n = sp.i;
+        """
+    )
+
+    logging.info(f"Generating {n_orders:,} orders...")
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE gen_order_headers AS
+        WITH headers AS (
+            SELECT
+                range + 1 AS order_no,
+                DATE '{date_range[0]}'
+                    + floor(uniform(range, 'order_date') * ({date_range[1]} + 1))::INTEGER
+                    AS order_date,
+                zipf(range, 'customer', {n_customers}, {customer_skew}) AS customer_no,
+                pick(range, 'location', {n_locations}) AS location_slot,
+                pick(range, 'ship_mode', {n_ship_modes}) AS ship_mode_slot,
+                pick(range, 'lines', {n_lines_slots}) AS lines_slot,
+                uniform(range, 'prefix') < 0.8 AS is_ca,
+                uniform(range, 'returned') AS return_draw,
+                uniform(range, 'ship_days') AS ship_days_draw
+            FROM range({n_orders})
+        )
+        SELECT
+            h.order_no,
+            CASE WHEN h.is_ca THEN 'CA' ELSE 'US' END
+                || '-' || year(h.order_date) || '-' || (100000 + h.order_no) AS order_id,
+            h.order_date,
+            h.order_date + (
+                m.min_days + floor(h.ship_days_draw * (m.max_days - m.min_days + 1))
+            )::INTEGER AS ship_date,
+            m.ship_mode,
+            c.customer_id,
+            c.customer_name,
+            c.segment,
+            l.country,
+            l.city,
+            l.state,
+            l.postal_code,
+            l.region,
+            n.lines,
+            h.return_draw < c.return_rate AS is_returned
+        FROM headers h
+        JOIN gen_customers c ON h.customer_no = c.customer_no
+        JOIN location_slots l ON h.location_slot = l.slot
+        JOIN ship_mode_slots m ON h.ship_mode_slot = m.slot
+        JOIN lines_slots n ON h.lines_slot = n.slot;
+        """
+    )
+
+    logging.info("Generating order lines...")
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE gen_orders AS
+        WITH lines AS (
+            SELECT
+                h.*,
+                unnest(range(h.lines)) AS line_no
+            FROM gen_order_headers h
+        ),
+        priced AS (
+            SELECT
+                l.*,
+                row_number() OVER (ORDER BY l.order_no, l.line_no) AS line_id,
+                p.product_id,
+                p.category,
+                p.sub_category,
+                p.product_name,
+                p.unit_price,
+                p.margin_mu,
+                p.margin_sigma,
+                q.quantity
+            FROM lines l
+            JOIN gen_products p
+                ON zipf(hash(l.order_no, l.line_no), 'product', {n_products}, {product_skew})
+                    = p.product_no
+            JOIN quantity_slots q
+                ON pick(hash(l.order_no, l.line_no), 'quantity', {n_quantities}) = q.slot
+        )
+        SELECT
+            line_id::INTEGER AS id,
+            order_id,
+            order_date,
+            ship_date,
+            ship_mode,
+            customer_id,
+            customer_name,
+            segment,
+            country,
+            city,
+            state,
+            postal_code::INTEGER AS postal_code,
+            region,
+            product_id,
+            category,
+            sub_category,
+            product_name,
+            round(unit_price * quantity, 4)::DOUBLE AS sales,
+            quantity::INTEGER AS quantity,
+            0::INTEGER AS discount,
+            round(
+                unit_price * quantity
+                * (margin_mu + margin_sigma * normal(line_id, 'margin')),
+                4
+            )::DOUBLE AS profit
+        FROM priced
+        ORDER BY id;
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TEMP TABLE gen_returns AS
+        SELECT 'Yes' AS returned, order_id
+        FROM gen_order_headers
+        WHERE is_returned
+        ORDER BY order_no;
+
+        CREATE TEMP TABLE gen_managers AS
+        SELECT manager, region FROM seed.managers;
+        """
+    )
+
+    return {
+        table: conn.execute(f"SELECT COUNT(*) FROM gen_{table};").fetchone()[0]
+        for table in ("orders", "returns", "managers")
+    }
+
+
+def write_tables(conn: duckdb.DuckDBPyConnection, target: str, schema: str) -> None:
+    """
+    Replaces the orders, returns and managers tables of the target catalog with the
+    generated data, using the column types of seed_data.sql.
+    """
+    for table in ("managers", "orders", "returns"):
+        logging.info(f"Writing {target}.{schema}.{table}...")
+        columns = conn.execute(
+            """
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'seed' AND table_name = ?
+            ORDER BY ordinal_position;
+            """,
+            (table,),
+        ).fetchall()
+        definition = ", ".join(f'"{name}" {data_type}' for name, data_type in columns)
+        names = ", ".join(f'"{name}"' for name, _ in columns)
+        conn.execute(f"DROP TABLE IF EXISTS {target}.{schema}.{table};")
+        conn.execute(f"CREATE TABLE {target}.{schema}.{table} ({definition});")
+        conn.execute(
+            f"INSERT INTO {target}.{schema}.{table} ({names}) "
+            f"SELECT {names} FROM gen_{table};"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parses the command line arguments of the data generator.
+    """
+    parser = argparse.ArgumentParser(
+        description=(
+            "Generate orders, returns and managers shaped like seed_data.sql at a "
+            "scale factor of the seed (1 is about 10k order lines, 1000 about 10M)."
+        )
+    )
+    parser.add_argument("--scale-factor", type=float, default=1.0)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument(
+        "--output",
+        default=SOURCE_PATH,
+        help="DuckDB file to write, a stand-in for Postgres attached as postgres_db.",
+    )
+    target.add_argument(
+        "--postgres",
+        help="libpq connection string of a Postgres database to write to instead.",
+    )
+    parser.add_argument("--seed-data", default=SEED_DATA_PATH)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument(
+        "--customer-skew",
+        type=float,
+        default=0.6,
+        help="Zipf exponent of orders per customer (default is 0.6).",
+    )
+    parser.add_argument(
+        "--product-skew",
+        type=float,
+        default=0.8,
+        help="Zipf exponent of order lines per product (default is 0.8).",
+    )
+    parser.add_argument(
+        "--return-skew",
+        type=float,
+        default=1.0,
+        help="Lognormal sigma of the per-customer return rate (default is 1.0).",
+    )
+    parser.add_argument("--memory-limit", default="4GB")
+    parser.add_argument("--temp-directory", default=tempfile.gettempdir())
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Generates benchmark data and writes it to a DuckDB file or a Postgres database.
+    """
+    args = parse_args()
+    for skew in (args.customer_skew, args.product_skew):
+        if skew == 1:
+            raise ValueError("Zipf exponents must not be exactly 1.")
+
+    conn = duckdb.connect(
+        config={
+            "memory_limit": args.memory_limit,
+            "temp_directory": args.temp_directory,
+        }
+    )
+    try:
+        load_seed(conn, args.seed_data)
+        create_macros(conn, args.random_seed)
+        counts = generate(
+            conn,
+            args.scale_factor,
+            args.customer_skew,
+            args.product_skew,
+            args.return_skew,
+        )
+
+        if args.postgres:
+            conn.execute("INSTALL postgres;")
+            conn.execute("LOAD postgres;")
+            conn.execute(f"ATTACH '{args.postgres}' AS target (TYPE POSTGRES);")
+            write_tables(conn, "target", "public")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            if os.path.exists(args.output):
+                os.remove(args.output)
+            conn.execute(f"ATTACH '{args.output}' AS target;")
+            write_tables(conn, "target", "main")
+
+        logging.info(
+            "Generated " + ", ".join(f"{n:,} {table}" for table, n in counts.items())
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
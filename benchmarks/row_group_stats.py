@@ -0,0 +1,136 @@
+import argparse
+import os
+import sys
+from typing import Dict, List, Tuple
+
+import duckdb
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+WAREHOUSE_PATH = os.path.join(BENCHMARKS_DIR, "data", "analytics.duckdb")
+
+# Tables and the columns dashboard queries filter on. How well the min/max
+# statistics of their row groups separate values decides how much of the table a
+# filter on them can skip.
+LAYOUT_COLUMNS: Dict[str, List[str]] = {
+    "orders": ["order_date", "customer_id"],
+    "main_analytics.fact_orders": ["order_date", "customer_sk"],
+    "main_analytics.fact_order_items": ["order_date", "customer_sk", "product_sk"],
+}
+
+# Column values probed per column, sampled from the table itself so that frequent
+# values weigh more, as they do in drill-downs.
+PROBES = 200
+
+
+def column_pruning(
+    conn: duckdb.DuckDBPyConnection, table: str, column: str
+) -> Tuple[int, float]:
+    """
+    Reads the min/max statistics of every row group of a column from
+    pragma_storage_info and returns the number of row groups and the average
+    fraction of them an equality filter on a sampled value of the column has to scan.
+    """
+    column_type = conn.execute(f'SELECT typeof("{column}") FROM {table} LIMIT 1;')
+    column_type = column_type.fetchone()[0]
+    row_groups, scanned = conn.execute(
+        f"""
+        WITH segments AS (
+            SELECT
+                row_group_id,
+                regexp_extract(stats, '\\[Min: ([^,]*), Max: ', 1) AS min_value,
+                regexp_extract(stats, ', Max: ([^,\\]]*)', 1) AS max_value
+            FROM pragma_storage_info('{table}')
+            WHERE column_name = ? AND segment_type != 'VALIDITY'
+        ),
+        ranges AS (
+            SELECT
+                row_group_id,
+                MIN(TRY_CAST(min_value AS {column_type})) AS low,
+                MAX(TRY_CAST(max_value AS {column_type})) AS high
+            FROM segments
+            GROUP BY row_group_id
+        ),
+        probes AS (
+            SELECT row_number() OVER () AS probe, value
+            FROM (SELECT "{column}" AS value FROM {table} WHERE "{column}" IS NOT NULL)
+            USING SAMPLE reservoir({PROBES} ROWS) REPEATABLE (42)
+        ),
+        hits AS (
+            SELECT
+                p.probe,
+                COUNT(r.row_group_id) AS row_groups
+            FROM probes p
+            LEFT JOIN ranges r
+                ON p.value BETWEEN r.low AND r.high OR r.low IS NULL
+            GROUP BY p.probe
+        )
+        SELECT
+            (SELECT COUNT(*) FROM ranges),
+            (SELECT AVG(row_groups) FROM hits)
+        """,
+        (column,),
+    ).fetchone()
+    return row_groups, (scanned or 0) / row_groups if row_groups else 0.0
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parses the command line arguments of the row-group statistics report.
+    """
+    parser = argparse.ArgumentParser(
+        description=(
+            "Report how many row groups an equality filter on the filtered columns "
+            "of the imported and fact tables scans, from their min/max statistics."
+        )
+    )
+    parser.add_argument("--warehouse", default=WAREHOUSE_PATH)
+    parser.add_argument(
+        "--table",
+        action="append",
+        metavar="TABLE:COLUMN[,COLUMN...]",
+        help="Table and columns to check instead of the defaults; repeatable.",
+    )
+    parser.add_argument(
+        "--max-scanned",
+        type=float,
+        help=(
+            "Exit with status 1 if a filter on the first column of any table scans "
+            "more than this fraction of its row groups."
+        ),
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Prints the row-group statistics report and optionally checks the leading sort
+    column of every table against --max-scanned.
+    """
+    args = parse_args()
+    tables: Dict[str, List[str]] = LAYOUT_COLUMNS
+    if args.table:
+        tables = {}
+        for spec in args.table:
+            table, _, columns = spec.partition(":")
+            tables[table] = columns.split(",")
+
+    failures: List[str] = []
+    conn = duckdb.connect(args.warehouse, read_only=True)
+    try:
+        print(f"{'table':<36} {'column':<16} {'row groups':>10} {'scanned':>8}")
+        for table, columns in tables.items():
+            for i, column in enumerate(columns):
+                row_groups, scanned = column_pruning(conn, table, column)
+                print(f"{table:<36} {column:<16} {row_groups:>10} {scanned:>8.1%}")
+                if i == 0 and args.max_scanned is not None:
+                    if scanned > args.max_scanned:
+                        failures.append(f"{table}.{column}")
+    finally:
+        conn.close()
+
+    if failures:
+        sys.exit(f"Poorly clustered: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
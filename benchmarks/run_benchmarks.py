@@ -0,0 +1,406 @@
+import argparse
+import datetime
+import inspect
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import duckdb
+import psycopg2.extensions
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+DBT_PROJECT_DIR = os.path.join(REPO_DIR, "dbt", "projects")
+DATA_DIR = os.path.join(BENCHMARKS_DIR, "data")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+sys.path.insert(0, os.path.join(REPO_DIR, "importer"))
+sys.path.insert(0, os.path.join(REPO_DIR, "dashboard"))
+
+import import_postgres_to_duckdb as importer  # noqa: E402
+import queries  # noqa: E402
+
+from generate_data import SOURCE_PATH  # noqa: E402
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# Per-table settings of the importer's import spec.
+IMPORT_TABLES: Dict[str, Dict[str, Any]] = importer.load_config(importer.CONFIG_PATH)[
+    "tables"
+]
+
+# Dashboard filters used for the filtered variant of every query function.
+BENCHMARK_FILTERS: Dict[str, Any] = {"region": ["West"], "category": ["Technology"]}
+
+# Benchmark timings, by name: the wall time in seconds of every run.
+Results = Dict[str, List[float]]
+
+
+def get_commit() -> Dict[str, Any]:
+    """
+    Identifies the commit being benchmarked.
+    """
+
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {
+            "commit": git("rev-parse", "HEAD"),
+            "subject": git("log", "-1", "--format=%s"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        }
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "subject": None, "dirty": None}
+
+
+def timed(func: Callable[..., Any], *args: Any, **kwargs: Any) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def postgres_config_from_dsn(postgres: str) -> Dict[str, Any]:
+    """
+    Converts a libpq connection string into the importer's PostgreSQL settings.
+    """
+    dsn = psycopg2.extensions.parse_dsn(postgres)
+    return {
+        "host": dsn.get("host"),
+        "port": dsn.get("port", 5432),
+        "database": dsn.get("dbname"),
+        "user": dsn.get("user"),
+        "password": dsn.get("password", ""),
+    }
+
+
+def benchmark_import(
+    warehouse_path: str,
+    source_path: str,
+    postgres: Optional[str],
+    extract_method: str = "scan",
+) -> Results:
+    """
+    Times a full import of every table with the given extraction method, and the swap
+    into place, into a fresh warehouse file.
+    """
+    for path in (warehouse_path, f"{warehouse_path}.wal"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    results: Results = {}
+    conn = duckdb.connect(warehouse_path)
+    try:
+        if postgres:
+            conn.execute("INSTALL postgres;")
+            conn.execute("LOAD postgres;")
+            conn.execute(
+                f"ATTACH '{postgres}' AS postgres_db (TYPE POSTGRES, READ_ONLY);"
+            )
+        else:
+            conn.execute(f"ATTACH '{source_path}' AS postgres_db (READ_ONLY);")
+        importer.ensure_state_table(conn)
+        postgres_config = postgres_config_from_dsn(postgres) if postgres else None
+
+        loads = []
+        start = time.perf_counter()
+        for table, settings in IMPORT_TABLES.items():
+            table_start = time.perf_counter()
+            loads.append(
+                importer.sync_table(
+                    conn,
+                    table,
+                    {**settings, "extract_method": extract_method},
+                    True,
+                    postgres_config,
+                )
+            )
+            results[f"import/{table}"] = [time.perf_counter() - table_start]
+        results["import/swap_tables"] = [timed(importer.swap_tables, conn, loads)]
+        results["import/total"] = [time.perf_counter() - start]
+    finally:
+        conn.close()
+    return results
+
+
+def run_dbt(
+    work_dir: str, full_refresh: bool, dbt_vars: Dict[str, Any]
+) -> Dict[str, float]:
+    """
+    Runs the dbt project against the warehouse in a separate process and returns the
+    build time of every model, from run_results.json.
+    """
+    target_path = os.path.join(work_dir, "target")
+    args = [
+        "dbt",
+        "run",
+        "--project-dir",
+        DBT_PROJECT_DIR,
+        "--profiles-dir",
+        work_dir,
+        "--target-path",
+        target_path,
+        "--log-path",
+        os.path.join(work_dir, "logs"),
+        "--vars",
+        json.dumps(dbt_vars),
+    ]
+    if full_refresh:
+        args.append("--full-refresh")
+    subprocess.run(args, check=True)
+
+    with open(os.path.join(target_path, "run_results.json")) as f:
+        run_results = json.load(f)
+    return {
+        result["unique_id"].split(".")[-1]: result["execution_time"]
+        for result in run_results["results"]
+    }
+
+
+def benchmark_dbt(warehouse_path: str, parquet_path: Optional[str]) -> Results:
+    """
+    Times a full-refresh build of every dbt model, then an incremental run with no
+    new data.
+    """
+    dbt_vars: Dict[str, Any] = {"parquet_export_enabled": parquet_path is not None}
+    if parquet_path:
+        shutil.rmtree(parquet_path, ignore_errors=True)
+        os.makedirs(parquet_path)
+        dbt_vars["parquet_export_path"] = parquet_path
+
+    results: Results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        with open(os.path.join(work_dir, "profiles.yml"), "w") as f:
+            f.write(
+                "default:\n"
+                "  outputs:\n"
+                "    duckdb:\n"
+                "      type: duckdb\n"
+                f"      path: {warehouse_path}\n"
+                "  target: duckdb\n"
+            )
+        for run, full_refresh in (("full_refresh", True), ("incremental", False)):
+            start = time.perf_counter()
+            timings = run_dbt(work_dir, full_refresh, dbt_vars)
+            results[f"dbt/{run}/total"] = [time.perf_counter() - start]
+            for model, seconds in timings.items():
+                results[f"dbt/{run}/{model}"] = [seconds]
+    return results
+
+
+def query_benchmarks() -> Dict[str, Callable[[], Any]]:
+    """
+    Lists every queries.get_* function, unfiltered and, where it takes filters,
+    with BENCHMARK_FILTERS, plus the first page of every drill-down table.
+    """
+    benchmarks: Dict[str, Callable[[], Any]] = {}
+    for name, func in inspect.getmembers(queries, inspect.isfunction):
+        if not name.startswith("get_") or func.__module__ != queries.__name__:
+            continue
+        if name in ("get_warehouse_version", "get_table_page"):
+            continue
+        benchmarks[f"queries/{name}"] = func
+        if "filters" in inspect.signature(func).parameters:
+            benchmarks[f"queries/{name}[filtered]"] = lambda func=func: func(
+                filters=BENCHMARK_FILTERS
+            )
+    for table in queries.TABLE_SOURCES:
+        benchmarks[f"queries/get_table_page[{table}]"] = lambda table=table: (
+            queries.get_table_page(table)
+        )
+    return benchmarks
+
+
+def benchmark_queries(warehouse_path: str, repeat: int) -> Results:
+    """
+    Times every dashboard query function against the warehouse with a cold result
+    cache, after one warm-up call that opens the connection. Slow query profiling is
+    turned off, as it would re-run queries in the background during the timings.
+    """
+    queries.DB_PATH = warehouse_path
+    queries.SLOW_QUERY_SECONDS = float("inf")
+    queries._connection_pool = queries.ConnectionPool(
+        warehouse_path, queries._connection_pool.config
+    )
+
+    results: Results = {}
+    for name, func in query_benchmarks().items():
+        queries._query_cache.clear()
+        func()
+        runs = []
+        for _ in range(repeat):
+            queries._query_cache.clear()
+            runs.append(timed(func))
+        results[name] = runs
+    return results
+
+
+def source_row_counts(source_path: str, postgres: Optional[str]) -> Dict[str, int]:
+    """
+    Counts the rows of every source table, recorded with the results.
+    """
+    conn = duckdb.connect()
+    try:
+        if postgres:
+            conn.execute("INSTALL postgres;")
+            conn.execute("LOAD postgres;")
+            conn.execute(f"ATTACH '{postgres}' AS source (TYPE POSTGRES, READ_ONLY);")
+        else:
+            conn.execute(f"ATTACH '{source_path}' AS source (READ_ONLY);")
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM source.{table};").fetchone()[0]
+            for table in IMPORT_TABLES
+        }
+    finally:
+        conn.close()
+
+
+def compare(results: Results, baseline_path: str, threshold: float) -> List[str]:
+    """
+    Prints the change of the median time of every benchmark against a baseline
+    results file.
+
+    Returns:
+        List[str]: The benchmarks that got slower by more than the threshold.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    baseline_commit = baseline["metadata"].get("commit") or "unknown"
+    print(f"\nCompared with {baseline_commit[:10]} ({baseline_path}):")
+    print(f"{'benchmark':<60} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    regressions = []
+    for name, runs in results.items():
+        if name not in baseline["results"]:
+            continue
+        before = statistics.median(baseline["results"][name])
+        after = statistics.median(runs)
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(f"{name:<60} {before:>10.4f} {after:>10.4f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parses the command line arguments of the benchmark harness.
+    """
+    parser = argparse.ArgumentParser(
+        description=(
+            "Time the importer, every dbt model and every dashboard query against "
+            "data from generate_data.py, and save the results for comparison."
+        )
+    )
+    parser.add_argument("--source", default=SOURCE_PATH)
+    parser.add_argument(
+        "--postgres",
+        help="libpq connection string of a Postgres source to import from instead.",
+    )
+    parser.add_argument(
+        "--extract-method",
+        choices=importer.EXTRACT_METHODS,
+        default="scan",
+        help="How the importer reads the source; copy needs --postgres.",
+    )
+    parser.add_argument(
+        "--warehouse", default=os.path.join(DATA_DIR, "analytics.duckdb")
+    )
+    parser.add_argument(
+        "--parquet",
+        default=os.path.join(DATA_DIR, "parquet"),
+        help="Parquet export path of the dbt run; empty to disable the export.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs of every query (default 5)."
+    )
+    parser.add_argument("--skip-import", action="store_true")
+    parser.add_argument("--skip-dbt", action="store_true")
+    parser.add_argument("--skip-queries", action="store_true")
+    parser.add_argument(
+        "--output",
+        help="Results file (default is results/<commit>-<orders rows>.json).",
+    )
+    parser.add_argument("--compare", help="Results file to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Relative slowdown reported as a regression (default is 0.25).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Runs the benchmarks, saves the results as JSON and optionally compares them with
+    an earlier run. Exits with status 1 if any benchmark regressed.
+    """
+    args = parse_args()
+    if not args.postgres and not os.path.exists(args.source):
+        sys.exit(f"{args.source} does not exist, run generate_data.py first.")
+    if args.extract_method == "copy" and not args.postgres:
+        sys.exit("--extract-method copy needs a --postgres source.")
+    warehouse_path = os.path.abspath(args.warehouse)
+    os.makedirs(os.path.dirname(warehouse_path), exist_ok=True)
+
+    rows = source_row_counts(args.source, args.postgres)
+    metadata = {
+        **get_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "source": "postgres" if args.postgres else os.path.abspath(args.source),
+        "rows": rows,
+        "extract_method": args.extract_method,
+        "duckdb_version": duckdb.__version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+    results: Results = {}
+    if not args.skip_import:
+        logging.info("Benchmarking the importer...")
+        results.update(
+            benchmark_import(
+                warehouse_path, args.source, args.postgres, args.extract_method
+            )
+        )
+    if not args.skip_dbt:
+        logging.info("Benchmarking the dbt models...")
+        results.update(benchmark_dbt(warehouse_path, args.parquet or None))
+    if not args.skip_queries:
+        logging.info("Benchmarking the dashboard queries...")
+        results.update(benchmark_queries(warehouse_path, args.repeat))
+
+    output = args.output
+    if output is None:
+        commit = (metadata["commit"] or "unknown")[:10]
+        output = os.path.join(RESULTS_DIR, f"{commit}-{rows['orders']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"metadata": metadata, "results": results}, f, indent=2)
+    logging.info(f"Saved results to {output}")
+
+    for name, runs in results.items():
+        print(f"{name:<60} {statistics.median(runs):>10.4f}s")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import dash
 import dash.dash_table as dt
+import flask
+import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+from dash import Input, Output
 import queries
 
 dark_theme = {
@@ -18,8 +22,110 @@ dark_theme = {
     },
 }
 
+section_style = {
+    "textAlign": "center",
+    "padding": "20px",
+    "border": f"1px solid {dark_theme['border']}",
+    "backgroundColor": dark_theme["card"],
+    "borderRadius": "10px",
+}
+
+# KPI cards, by component id: card title, column of queries.get_kpis() and format.
+kpi_cards = {
+    "kpi_return_rate": ("Return Rate", "return_rate", "{:.2f}%"),
+    "kpi_total_orders_returned": (
+        "Total Orders Returned",
+        "total_orders_returned",
+        "{:,.0f}",
+    ),
+    "kpi_return_rate_per_customer": (
+        "Return Rate per Customer",
+        "return_rate_per_customer",
+        "{:.2f}%",
+    ),
+    "kpi_total_customers": ("Total Customers", "total_customers", "{:,.0f}"),
+    "kpi_avg_ticket": ("Avg Ticket Size", "avg_ticket", "${:,.2f}"),
+    "kpi_avg_orders_per_customer": (
+        "Avg Orders per Customer",
+        "avg_orders_per_customer",
+        "{:,.1f}",
+    ),
+    "kpi_contribution_margin": (
+        "Contribution Margin",
+        "contribution_margin",
+        "{:.2f}%",
+    ),
+    "kpi_net_revenue": ("Net Revenue", "net_revenue", "${:,.2f}"),
+    "kpi_effective_profit_margin": (
+        "Effective Profit Margin",
+        "effective_profit_margin",
+        "{:.2f}%",
+    ),
+    "kpi_avg_delivery_time": ("Avg Delivery Time", "avg_delivery_time", "{:.1f} days"),
+}
+
+# Server-side paginated tables, by component id: source in queries.TABLE_SOURCES,
+# displayed columns and page size.
+data_tables = {
+    "table_customer_returns": (
+        "customer_returns",
+        [
+            ("Customer Name", "customer_name"),
+            ("Segment", "segment"),
+            ("Total Orders", "total_orders"),
+            ("Returned Orders", "returned_orders"),
+            ("Return Rate (%)", "return_rate"),
+        ],
+        5,
+    ),
+    "table_orders": (
+        "orders",
+        [
+            ("Order ID", "order_id"),
+            ("Order Date", "order_date"),
+            ("Ship Date", "ship_date"),
+            ("Ship Mode", "ship_mode"),
+            ("Customer Name", "customer_name"),
+            ("Region", "region"),
+            ("City", "city"),
+            ("Sales", "sales"),
+            ("Quantity", "quantity"),
+            ("Profit", "profit"),
+            ("Returned", "returned"),
+        ],
+        10,
+    ),
+    "table_order_items": (
+        "order_items",
+        [
+            ("Line", "order_line_id"),
+            ("Order ID", "order_id"),
+            ("Order Date", "order_date"),
+            ("Product", "product_name"),
+            ("Category", "category"),
+            ("Sub-Category", "sub_category"),
+            ("Customer Name", "customer_name"),
+            ("Sales", "sales"),
+            ("Quantity", "quantity"),
+            ("Profit", "profit"),
+        ],
+        10,
+    ),
+}
+
 
 def create_figure(df, x, y, title, chart_type="line"):
+    if df is None:
+        fig = go.Figure()
+        fig.update_layout(
+            title=f"{title} (no data)",
+            template="plotly_dark",
+            plot_bgcolor=dark_theme["background"],
+            paper_bgcolor=dark_theme["background"],
+            font=dict(family=dark_theme["font"]["family"], color=dark_theme["text"]),
+        )
+        return fig
+
     fig = (
         px.line(df, x=x, y=y, title=title)
         if chart_type == "line"
@@ -43,62 +149,8 @@ def create_figure(df, x, y, title, chart_type="line"):
     return fig
 
 
-app = dash.Dash(__name__)
-
-df_sales = queries.get_sales_over_time()
-df_categories = queries.get_top_categories()
-df_returns = queries.get_return_rate()
-df_return_metrics = queries.get_return_metrics()
-df_total_orders = queries.get_total_orders()
-df_total_customers = queries.get_total_customers()
-df_avg_ticket = queries.get_avg_ticket()
-df_avg_orders_per_customer = queries.get_avg_orders_per_customer()
-df_return_rate_per_customer = queries.get_return_rate_per_customer()
-df_top_return_customers = queries.get_top_return_customers()
-df_top_customers = queries.get_top_customers()
-df_top_managers = queries.get_top_managers()
-df_avg_delivery_time = queries.get_avg_delivery_time()
-df_contribution_margin = queries.get_contribution_margin()
-df_net_revenue = queries.get_net_revenue()
-df_effective_profit_margin = queries.get_effective_profit_margin()
-
-fig_sales = create_figure(
-    df_sales, "month", ["total_sales", "total_profit"], "Sales and Profit Over Time"
-)
-fig_categories = create_figure(
-    df_categories, "category", "total_sales", "Top 10 Best-Selling Categories", "bar"
-)
-fig_top_customers = create_figure(
-    df_top_customers, "customer_name", "total_sales", "Top Customers by Sales", "bar"
-)
-fig_top_managers = create_figure(
-    df_top_managers, "manager", "total_sales", "Top Performing Managers", "bar"
-)
-
-table_top_return_customers = dt.DataTable(
-    columns=[
-        {"name": "Customer Name", "id": "customer_name"},
-        {"name": "Total Orders", "id": "total_orders"},
-        {"name": "Returned Orders", "id": "returned_orders"},
-        {"name": "Return Rate (%)", "id": "return_rate"},
-    ],
-    data=df_top_return_customers.to_dict("records"),
-    style_header={
-        "backgroundColor": dark_theme["card"],
-        "color": dark_theme["primary"],
-        "fontWeight": "bold",
-        "textAlign": "center",
-    },
-    style_cell={
-        "backgroundColor": dark_theme["card"],
-        "color": dark_theme["text"],
-        "textAlign": "center",
-    },
-    style_table={"margin": "auto"},
-)
-
-
-def create_kpi_card(title, value):
+def create_kpi_card(card_id):
+    title = kpi_cards[card_id][0]
     return dash.html.Div(
         [
             dash.html.H3(
@@ -111,7 +163,8 @@ def create_kpi_card(title, value):
                 },
             ),
             dash.html.H2(
-                f"{value}",
+                "…",
+                id=card_id,
                 style={
                     "fontSize": dark_theme["font"]["size_title"],
                     "color": dark_theme["text"],
@@ -138,65 +191,12 @@ def create_kpi_card(title, value):
     )
 
 
-app.layout = dash.html.Div(
-    children=[
-        dash.html.H1(
-            "Sales Dashboard",
-            style={
-                "textAlign": "center",
-                "color": dark_theme["text"],
-                "fontFamily": dark_theme["font"]["family"],
-                "fontWeight": dark_theme["font"]["weight_title"],
-            },
-        ),
-        # Sales and Categories
-        dash.dcc.Graph(id="sales_graph", figure=fig_sales),
-        dash.dcc.Graph(id="category_graph", figure=fig_categories),
-        # Returns Overview
-        dash.html.Div(
-            [
-                dash.html.H3(
-                    "Returns Overview",
-                    style={
-                        "color": dark_theme["primary"],
-                        "fontFamily": dark_theme["font"]["family"],
-                        "fontWeight": dark_theme["font"]["weight_title"],
-                        "fontSize": dark_theme["font"]["size_title"],
-                    },
-                ),
-                create_kpi_card("Return Rate", f"{df_returns.iloc[0, 0]:.2f}%"),
-                create_kpi_card(
-                    "Total Orders Returned",
-                    f"{df_return_metrics.iloc[0, 0]:,.0f}",
-                ),
-                create_kpi_card(
-                    "Return Rate per Customer",
-                    f"{df_return_metrics.iloc[0, 1]:.2f}%",
-                ),
-                dash.html.H4(
-                    "Top 5 Customers with Highest Return Rates",
-                    style={
-                        "color": dark_theme["primary"],
-                        "textAlign": "center",
-                        "marginTop": "20px",
-                        "fontFamily": dark_theme["font"]["family"],
-                    },
-                ),
-                table_top_return_customers,
-            ],
-            style={
-                "textAlign": "center",
-                "padding": "20px",
-                "border": f"1px solid {dark_theme['border']}",
-                "backgroundColor": dark_theme["card"],
-                "borderRadius": "10px",
-            },
-        ),
-        # Customer Insights
+def create_section(title, children):
+    return dash.dcc.Loading(
         dash.html.Div(
             [
                 dash.html.H3(
-                    "Customer Insights",
+                    title,
                     style={
                         "color": dark_theme["primary"],
                         "fontFamily": dark_theme["font"]["family"],
@@ -204,86 +204,357 @@ app.layout = dash.html.Div(
                         "fontSize": dark_theme["font"]["size_title"],
                     },
                 ),
-                create_kpi_card(
-                    "Total Customers", f"{df_total_customers.iloc[0, 0]:,.0f}"
-                ),
-                create_kpi_card("Avg Ticket Size", f"${df_avg_ticket.iloc[0, 0]:,.2f}"),
-                create_kpi_card(
-                    "Avg Orders per Customer",
-                    f"{df_avg_orders_per_customer.iloc[0, 0]:,.1f}",
-                ),
-                dash.dcc.Graph(id="top_customers", figure=fig_top_customers),
+                *children,
             ],
-            style={
-                "textAlign": "center",
-                "padding": "20px",
-                "border": f"1px solid {dark_theme['border']}",
-                "backgroundColor": dark_theme["card"],
-                "borderRadius": "10px",
-            },
+            style=section_style,
         ),
-        # Manager Performance
-        dash.dcc.Graph(id="top_managers", figure=fig_top_managers),
-        # Financial Performance
-        dash.html.Div(
-            [
-                dash.html.H3(
-                    "Financial Performance",
-                    style={
-                        "color": dark_theme["primary"],
-                        "fontFamily": dark_theme["font"]["family"],
-                        "fontWeight": dark_theme["font"]["weight_title"],
-                        "fontSize": dark_theme["font"]["size_title"],
-                    },
-                ),
-                create_kpi_card(
-                    "Contribution Margin", f"{df_contribution_margin.iloc[0, 0]:.2f}%"
-                ),
-                create_kpi_card("Net Revenue", f"${df_net_revenue.iloc[0, 0]:,.2f}"),
-                create_kpi_card(
-                    "Effective Profit Margin",
-                    f"{df_effective_profit_margin.iloc[0, 0]:.2f}%",
-                ),
+        type="dot",
+    )
+
+
+def create_data_table(table_id):
+    source, columns, page_size = data_tables[table_id]
+    column_types = queries.TABLE_SOURCES[source]["columns"]
+    return dt.DataTable(
+        id=table_id,
+        columns=[
+            {"name": name, "id": column, "type": column_types[column]}
+            for name, column in columns
+        ],
+        page_current=0,
+        page_size=page_size,
+        page_action="custom",
+        sort_action="custom",
+        sort_mode="multi",
+        sort_by=[],
+        filter_action="custom",
+        filter_query="",
+        style_header={
+            "backgroundColor": dark_theme["card"],
+            "color": dark_theme["primary"],
+            "fontWeight": "bold",
+            "textAlign": "center",
+        },
+        style_filter={
+            "backgroundColor": dark_theme["card"],
+            "color": dark_theme["text"],
+        },
+        style_cell={
+            "backgroundColor": dark_theme["card"],
+            "color": dark_theme["text"],
+            "textAlign": "center",
+        },
+        style_table={"margin": "auto", "marginTop": "20px", "overflowX": "auto"},
+    )
+
+
+def create_filter_bar(options):
+    dropdown_style = {"width": "220px", "display": "inline-block", "margin": "10px"}
+    return dash.html.Div(
+        [
+            dash.dcc.DatePickerRange(
+                id="filter_dates",
+                min_date_allowed=options["min_date"],
+                max_date_allowed=options["max_date"],
+                start_date_placeholder_text="Start date",
+                end_date_placeholder_text="End date",
+                clearable=True,
+                style={"margin": "10px"},
+            ),
+            *[
+                dash.dcc.Dropdown(
+                    id=f"filter_{name}",
+                    options=options[name],
+                    multi=True,
+                    placeholder=name.title(),
+                    style=dropdown_style,
+                )
+                for name in ("region", "segment", "category")
             ],
-            style={
-                "textAlign": "center",
-                "padding": "20px",
-                "border": f"1px solid {dark_theme['border']}",
-                "backgroundColor": dark_theme["card"],
-                "borderRadius": "10px",
-            },
+        ],
+        style={"textAlign": "center", "marginBottom": "20px"},
+    )
+
+
+def format_kpis(df_kpis, card_ids):
+    values = []
+    for card_id in card_ids:
+        _, column, template = kpi_cards[card_id]
+        value = df_kpis[column].iloc[0] if df_kpis is not None else None
+        values.append(template.format(value) if pd.notna(value) else "–")
+    return values
+
+
+def serve_layout():
+    return dash.html.Div(
+        children=[
+            dash.html.H1(
+                "Sales Dashboard",
+                style={
+                    "textAlign": "center",
+                    "color": dark_theme["text"],
+                    "fontFamily": dark_theme["font"]["family"],
+                    "fontWeight": dark_theme["font"]["weight_title"],
+                },
+            ),
+            create_filter_bar(queries.get_filter_options()),
+            dash.dcc.Store(id="filters", data={}),
+            # Sales and Categories
+            dash.dcc.Loading(dash.dcc.Graph(id="sales_graph"), type="dot"),
+            dash.dcc.Loading(dash.dcc.Graph(id="category_graph"), type="dot"),
+            # Returns Overview
+            create_section(
+                "Returns Overview",
+                [
+                    create_kpi_card("kpi_return_rate"),
+                    create_kpi_card("kpi_total_orders_returned"),
+                    create_kpi_card("kpi_return_rate_per_customer"),
+                    dash.html.H4(
+                        "Customers by Return Rate",
+                        style={
+                            "color": dark_theme["primary"],
+                            "textAlign": "center",
+                            "marginTop": "20px",
+                            "fontFamily": dark_theme["font"]["family"],
+                        },
+                    ),
+                    create_data_table("table_customer_returns"),
+                ],
+            ),
+            # Customer Insights
+            create_section(
+                "Customer Insights",
+                [
+                    create_kpi_card("kpi_total_customers"),
+                    create_kpi_card("kpi_avg_ticket"),
+                    create_kpi_card("kpi_avg_orders_per_customer"),
+                    dash.dcc.Graph(id="top_customers"),
+                ],
+            ),
+            # Manager Performance
+            dash.dcc.Loading(dash.dcc.Graph(id="top_managers"), type="dot"),
+            # Financial Performance
+            create_section(
+                "Financial Performance",
+                [
+                    create_kpi_card("kpi_contribution_margin"),
+                    create_kpi_card("kpi_net_revenue"),
+                    create_kpi_card("kpi_effective_profit_margin"),
+                ],
+            ),
+            # Logistics Performance
+            create_section(
+                "Logistics Performance",
+                [create_kpi_card("kpi_avg_delivery_time")],
+            ),
+            # Order Details
+            create_section(
+                "Order Details",
+                [
+                    create_data_table("table_orders"),
+                    create_data_table("table_order_items"),
+                ],
+            ),
+        ],
+        style={
+            "backgroundColor": dark_theme["background"],
+            "color": dark_theme["text"],
+            "padding": "20px",
+        },
+    )
+
+
+app = dash.Dash(__name__)
+# The layout is built per page load and only holds the filter bar and empty
+# components; every section is filled in by its own callback below, so the first
+# paint does not wait on the queries and each section loads independently.
+app.layout = serve_layout
+
+
+@app.server.route("/metrics")
+def metrics():
+    # Per-query stats from queries.query_stats, for scraping by Prometheus.
+    return flask.Response(
+        queries.query_stats.to_prometheus(), mimetype="text/plain; version=0.0.4"
+    )
+
+
+@app.server.route("/metrics/slow-queries")
+def slow_queries():
+    # Latest EXPLAIN ANALYZE profile of every query over queries.SLOW_QUERY_SECONDS.
+    profiles = queries.query_stats.profiles()
+    body = "\n\n".join(
+        f"-- {name} ({seconds:.3f}s)\n{profile}"
+        for name, (seconds, profile) in sorted(profiles.items())
+    )
+    return flask.Response(body, mimetype="text/plain")
+
+
+@app.callback(
+    Output("filters", "data"),
+    Input("filter_dates", "start_date"),
+    Input("filter_dates", "end_date"),
+    Input("filter_region", "value"),
+    Input("filter_segment", "value"),
+    Input("filter_category", "value"),
+)
+def update_filters(start_date, end_date, region, segment, category):
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "region": region,
+        "segment": segment,
+        "category": category,
+    }
+
+
+@app.callback(Output("sales_graph", "figure"), Input("filters", "data"))
+def update_sales_graph(filters):
+    return create_figure(
+        queries.get_sales_over_time(filters=filters),
+        "month",
+        ["total_sales", "total_profit"],
+        "Sales and Profit Over Time",
+    )
+
+
+@app.callback(Output("category_graph", "figure"), Input("filters", "data"))
+def update_category_graph(filters):
+    return create_figure(
+        queries.get_top_categories(filters=filters),
+        "category",
+        "total_sales",
+        "Top 10 Best-Selling Categories",
+        "bar",
+    )
+
+
+@app.callback(
+    Output("kpi_return_rate", "children"),
+    Output("kpi_total_orders_returned", "children"),
+    Output("kpi_return_rate_per_customer", "children"),
+    Input("filters", "data"),
+)
+def update_returns_overview(filters):
+    return format_kpis(
+        queries.get_kpis(filters),
+        [
+            "kpi_return_rate",
+            "kpi_total_orders_returned",
+            "kpi_return_rate_per_customer",
+        ],
+    )
+
+
+@app.callback(
+    Output("kpi_total_customers", "children"),
+    Output("kpi_avg_ticket", "children"),
+    Output("kpi_avg_orders_per_customer", "children"),
+    Output("top_customers", "figure"),
+    Input("filters", "data"),
+)
+def update_customer_insights(filters):
+    results = queries.run_batch(
+        {
+            "kpis": (queries.get_kpis, {"filters": filters}),
+            "top_customers": (queries.get_top_customers, {"filters": filters}),
+        }
+    )
+    return (
+        *format_kpis(
+            results["kpis"][0],
+            ["kpi_total_customers", "kpi_avg_ticket", "kpi_avg_orders_per_customer"],
         ),
-        # Logistics Performance
-        dash.html.Div(
-            [
-                dash.html.H3(
-                    "Logistics Performance",
-                    style={
-                        "color": dark_theme["primary"],
-                        "fontFamily": dark_theme["font"]["family"],
-                        "fontWeight": dark_theme["font"]["weight_title"],
-                        "fontSize": dark_theme["font"]["size_title"],
-                    },
-                ),
-                create_kpi_card(
-                    "Avg Delivery Time", f"{df_avg_delivery_time.iloc[0, 0]:.1f} days"
-                ),
-            ],
-            style={
-                "textAlign": "center",
-                "padding": "20px",
-                "border": f"1px solid {dark_theme['border']}",
-                "backgroundColor": dark_theme["card"],
-                "borderRadius": "10px",
-            },
+        create_figure(
+            results["top_customers"][0],
+            "customer_name",
+            "total_sales",
+            "Top Customers by Sales",
+            "bar",
         ),
-    ],
-    style={
-        "backgroundColor": dark_theme["background"],
-        "color": dark_theme["text"],
-        "padding": "20px",
-    },
+    )
+
+
+@app.callback(Output("top_managers", "figure"), Input("filters", "data"))
+def update_top_managers(filters):
+    return create_figure(
+        queries.get_top_managers(filters=filters),
+        "manager",
+        "total_sales",
+        "Top Performing Managers",
+        "bar",
+    )
+
+
+@app.callback(
+    Output("kpi_contribution_margin", "children"),
+    Output("kpi_net_revenue", "children"),
+    Output("kpi_effective_profit_margin", "children"),
+    Input("filters", "data"),
 )
+def update_financial_performance(filters):
+    return format_kpis(
+        queries.get_kpis(filters),
+        [
+            "kpi_contribution_margin",
+            "kpi_net_revenue",
+            "kpi_effective_profit_margin",
+        ],
+    )
+
+
+@app.callback(Output("kpi_avg_delivery_time", "children"), Input("filters", "data"))
+def update_logistics_performance(filters):
+    return format_kpis(queries.get_kpis(filters), ["kpi_avg_delivery_time"])[0]
+
+
+def register_data_table_callback(table_id):
+    source = data_tables[table_id][0]
+
+    # Paging, sorting and filtering are done in DuckDB, so the browser only ever
+    # receives the rows of the current page. Anything but paging restarts at page one.
+    @app.callback(
+        Output(table_id, "data"),
+        Output(table_id, "page_count"),
+        Output(table_id, "page_current"),
+        Input(table_id, "page_current"),
+        Input(table_id, "page_size"),
+        Input(table_id, "sort_by"),
+        Input(table_id, "filter_query"),
+        Input("filters", "data"),
+    )
+    def update_data_table(page_current, page_size, sort_by, filter_query, filters):
+        if f"{table_id}.page_current" not in dash.ctx.triggered_prop_ids:
+            page_current = 0
+        page, page_count = queries.get_table_page(
+            source, page_current, page_size, sort_by, filter_query, filters
+        )
+        return (page.to_pylist() if page is not None else []), page_count, page_current
+
+
+for table_id in data_tables:
+    register_data_table_callback(table_id)
+
+
+def load_default_view():
+    # The queries behind a page load without filters, warmed up on every new
+    # warehouse build before the dashboard switches to it.
+    queries.get_filter_options()
+    queries.get_sales_over_time()
+    queries.get_top_categories()
+    queries.get_kpis()
+    queries.get_top_customers()
+    queries.get_top_managers()
+    for source, _, page_size in data_tables.values():
+        queries.get_table_page(source, 0, page_size)
+
+
+@app.server.before_request
+def start_warehouse_refresher():
+    # Started by the first request of every process that serves requests, which skips
+    # the debug reloader's parent and a gunicorn master.
+    queries.ensure_warehouse_refresher(prewarm=load_default_view)
+
 
 if __name__ == "__main__":
-    app.run_server(debug=True, host="0.0.0.0", port=8051)
+    app.run(debug=True, host="0.0.0.0", port=8051)
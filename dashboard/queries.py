@@ -1,8 +1,30 @@
+import fcntl
 import logging
-from typing import Optional
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import duckdb
 import pandas as pd
+import pyarrow as pa
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -10,296 +32,2013 @@ logging.basicConfig(
 
 DB_PATH = "/db/analytics.duckdb"
 
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL_SECONDS = 300
+
+# The "serve" execution profile: DuckDB memory, thread and spill budgets of every
+# dashboard connection. The importer ("ingest") and dbt ("transform") run under their
+# own profiles, in importer/import_config.toml and dbt/profiles.yml, so that batch
+# work cannot take the memory interactive queries need.
+SERVE_PROFILE: Dict[str, Any] = {
+    "threads": 4,
+    "memory_limit": "1GB",
+    "temp_directory": "/tmp/duckdb-serve",
+    "max_temp_directory_size": "4GB",
+}
+
+BATCH_MAX_WORKERS = 8
+
+# Queries slower than this are re-run under EXPLAIN ANALYZE and their profile logged.
+SLOW_QUERY_SECONDS = 0.5
+QUERY_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Background refresh, see WarehouseRefresher: where snapshots of new builds are
+# kept, how often the warehouse file is checked, how long a new build must stay
+# unchanged before it is picked up, how long a build is served at least before the
+# next one is copied, and how many of the most recently used queries are replayed
+# against it before the switch. Every switch copies the whole warehouse file once per
+# serving process, so the minimum interval bounds that disk IO when the importer
+# runs in CDC mode and changes the file every few seconds.
+SNAPSHOT_DIR = "/tmp/warehouse-snapshots"
+REFRESH_INTERVAL_SECONDS = 5
+REFRESH_SETTLE_SECONDS = 10
+REFRESH_MIN_INTERVAL_SECONDS = 300
+PREWARM_MAX_QUERIES = 64
+
+# Distinct counts of customers and orders are the most memory-hungry part of the KPI
+# queries. With approximate counts, get_kpis() merges the daily HyperLogLog sketches
+# of agg_kpis_daily instead of scanning fact_orders, and other distinct counts use
+# approx_count_distinct(). HLL_PRECISION must match the hll_precision dbt var; the
+# standard error of a sketch estimate is 1.04 / sqrt(2 ** HLL_PRECISION), 1.6% at 12.
+APPROXIMATE_DISTINCT_COUNTS = False
+HLL_PRECISION = 12
+
+
+def get_warehouse_version(db_path: Optional[str] = None) -> Optional[Tuple[int, ...]]:
+    """
+    Identifies the current build of the DuckDB file from the inode, size and
+    modification time of the database and its write-ahead log. Any importer or dbt
+    run that writes to the warehouse changes the version.
+
+    Args:
+        db_path (str, optional): The DuckDB file (default is DB_PATH).
+
+    Returns:
+        Optional[Tuple[int, ...]]: The version, or None if the file does not exist.
+    """
+    db_path = db_path or DB_PATH
+    version = []
+    for path in (db_path, f"{db_path}.wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if path == db_path:
+                return None
+            continue
+        version.extend((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return tuple(version)
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results with a time-to-live. Every entry belongs to
+    a warehouse version, and the whole cache is dropped as soon as a lookup is made
+    with a different version.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._version: Optional[Tuple[int, ...]] = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: Optional[Tuple[int, ...]]) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(
+        self, key: Hashable, version: Optional[Tuple[int, ...]]
+    ) -> Tuple[bool, Any]:
+        """
+        Looks up a cached result.
+
+        Returns:
+            Tuple[bool, Any]: Whether the key was found, and the cached value.
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(
+        self, key: Hashable, version: Optional[Tuple[int, ...]], value: Any
+    ) -> None:
+        """
+        Stores a result, evicting the least recently used entry when the cache is full.
+        """
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def recent_keys(self, limit: int) -> List[Hashable]:
+        """
+        Lists the keys of the unexpired entries, most recently used first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            keys = [
+                key
+                for key, (expires_at, _) in reversed(self._entries.items())
+                if expires_at >= now
+            ]
+        return keys[:limit]
+
+    def clear(self) -> None:
+        """
+        Drops every cached result.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+class ReadWriteLock:
+    """
+    Lock that any number of threads can hold shared, or a single thread exclusively.
+    A thread waiting for exclusive access holds off new shared holders, so it is not
+    starved, except for threads that already hold the lock shared and take it again.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """
+        Holds the lock shared for the duration of the block.
+        """
+        held = getattr(self._local, "held", 0)
+        with self._condition:
+            while self._writer or (self._writers_waiting and not held):
+                self._condition.wait()
+            self._readers += 1
+        self._local.held = held + 1
+        try:
+            yield
+        finally:
+            self._local.held = held
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """
+        Holds the lock exclusively for the duration of the block.
+        """
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+# DuckDB locks its files with POSIX record locks, and a process drops all of its locks
+# on a file as soon as it closes any descriptor of it. Every access to the live
+# warehouse file from this process therefore goes through this lock: queries hold it
+# shared, and the WarehouseRefresher holds it exclusively while it opens the file.
+_live_file_lock = ReadWriteLock()
+
+
+class ConnectionPool:
+    """
+    Process-wide read-only DuckDB connection that hands out one cursor per thread, so
+    Dash worker threads share the catalog and buffer pool without sharing a cursor.
+
+    The connection is reopened when the warehouse version changes, e.g. when a new
+    build replaces the file. Threads pick up a cursor on the new connection on their
+    next query; the old connection is released once its last cursor is dropped. Each
+    connection is a fresh in-memory instance with the warehouse attached read-only,
+    because DuckDB would otherwise hand back its cached instance of the old file.
+
+    Only a pool over a file that never changes, such as a snapshot taken by the
+    WarehouseRefresher, keeps its connection; it is given its version up front and
+    never reopens. A read-only attach locks the file against writers, so a pool over
+    the live warehouse file keeps it attached only while queries run on it, leaving
+    the importer and dbt free to write between queries. Concurrent queries share one
+    attach, detached when the last of them finishes, since detaching one of several
+    would drop the lock of all (see _live_file_lock).
+    """
+
+    def __init__(
+        self, db_path: str, config: dict, version: Optional[Tuple[int, ...]] = None
+    ) -> None:
+        self.db_path = db_path
+        self.config = config
+        self.fixed_version = version
+        self._conn: Optional[duckdb.DuckDBPyConnection] = None
+        self._version: Optional[Tuple[int, ...]] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._live_conn: Optional[duckdb.DuckDBPyConnection] = None
+        self._live_queries = 0
+
+    def warehouse_version(self) -> Optional[Tuple[int, ...]]:
+        """
+        Returns the version of the file the pool reads, see get_warehouse_version().
+        """
+        if self.fixed_version is not None:
+            return self.fixed_version
+        return get_warehouse_version(self.db_path)
+
+    @contextmanager
+    def open_cursor(
+        self, version: Optional[Tuple[int, ...]]
+    ) -> Iterator[duckdb.DuckDBPyConnection]:
+        """
+        Opens a new cursor on the connection for the given version, closed again when
+        the block exits.
+        """
+        if self.fixed_version is None:
+            with self._live_cursor() as cursor:
+                yield cursor
+            return
+        cursor = self._open(version)[0]
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def borrow(
+        self, version: Optional[Tuple[int, ...]]
+    ) -> Iterator[duckdb.DuckDBPyConnection]:
+        """
+        Lends a cursor for one query: the calling thread's cursor on a pool with a
+        fixed version, or a cursor of its own on the live file.
+        """
+        if self.fixed_version is not None:
+            yield self.cursor(version)
+            return
+        with self._live_cursor() as cursor:
+            yield cursor
+
+    def cursor(self, version: Optional[Tuple[int, ...]]) -> duckdb.DuckDBPyConnection:
+        """
+        Returns the calling thread's cursor on the connection for the given version.
+        """
+        local = self._local
+        with self._lock:
+            current = self._conn is not None and version == self._version
+            if current and getattr(local, "generation", None) == self._generation:
+                return local.cursor
+        local.cursor, local.generation = self._open(version)
+        return local.cursor
+
+    def _open(
+        self, version: Optional[Tuple[int, ...]]
+    ) -> Tuple[duckdb.DuckDBPyConnection, int]:
+        with self._lock:
+            if self._conn is None or version != self._version:
+                logging.info(f"Opening read-only DuckDB connection to {self.db_path}")
+                self._conn = self._connect()
+                self._version = version
+                self._generation += 1
+            conn, generation = self._conn, self._generation
+
+        cursor = conn.cursor()
+        cursor.execute("USE warehouse;")
+        return cursor, generation
+
+    @contextmanager
+    def _live_cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        with _live_file_lock.shared():
+            with self._lock:
+                if self._live_conn is None:
+                    self._live_conn = self._connect()
+                self._live_queries += 1
+                conn = self._live_conn
+            try:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("USE warehouse;")
+                    yield cursor
+                finally:
+                    cursor.close()
+            finally:
+                with self._lock:
+                    self._live_queries -= 1
+                    if not self._live_queries:
+                        self._live_conn.close()
+                        self._live_conn = None
+
+    def _connect(self) -> duckdb.DuckDBPyConnection:
+        conn = duckdb.connect(":memory:", config=self.config)
+        conn.execute(f"ATTACH '{self.db_path}' AS warehouse (READ_ONLY);")
+        conn.execute("USE warehouse;")
+        return conn
+
+    def reset(self) -> None:
+        """
+        Forgets the current connection so the next query opens a fresh one.
+        """
+        with self._lock:
+            self._conn = None
+            self._version = None
+
+
+class QueryStats:
+    """
+    Thread-safe per-query counters: executions and their wall time, rows returned,
+    Arrow bytes materialized, cache hits, errors and slow queries, plus the latest
+    EXPLAIN ANALYZE profile of each slow query. Queries are identified by the name
+    passed to execute_query().
+    """
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._profiles: Dict[str, Tuple[float, str]] = {}
+        self._profiling: set = set()
+        self._lock = threading.Lock()
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        entry = self._stats.get(name)
+        if entry is None:
+            entry = {
+                "buckets": [0] * len(self.buckets),
+                "count": 0,
+                "seconds": 0.0,
+                "rows": 0,
+                "bytes": 0,
+                "cache_hits": 0,
+                "errors": 0,
+                "slow": 0,
+            }
+            self._stats[name] = entry
+        return entry
+
+    def record(self, name: str, seconds: float, rows: int, nbytes: int) -> None:
+        """
+        Records a query executed in DuckDB.
+        """
+        with self._lock:
+            entry = self._entry(name)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["rows"] += rows
+            entry["bytes"] += nbytes
+
+    def record_cache_hit(self, name: str) -> None:
+        """
+        Records a query answered from the result cache.
+        """
+        with self._lock:
+            self._entry(name)["cache_hits"] += 1
+
+    def record_error(self, name: str) -> None:
+        """
+        Records a failed query.
+        """
+        with self._lock:
+            self._entry(name)["errors"] += 1
+
+    def start_profile(self, name: str) -> bool:
+        """
+        Counts a slow query and claims its profiling slot.
+
+        Returns:
+            bool: False if a profile of this query is already being captured.
+        """
+        with self._lock:
+            self._entry(name)["slow"] += 1
+            if name in self._profiling:
+                return False
+            self._profiling.add(name)
+            return True
+
+    def finish_profile(self, name: str, seconds: float, profile: Optional[str]) -> None:
+        """
+        Stores the EXPLAIN ANALYZE profile of a slow query and releases its slot.
+        """
+        with self._lock:
+            self._profiling.discard(name)
+            if profile is not None:
+                self._profiles[name] = (seconds, profile)
+
+    def profiles(self) -> Dict[str, Tuple[float, str]]:
+        """
+        Returns the latest profile of each slow query, with the wall time that
+        triggered it, by query name.
+        """
+        with self._lock:
+            return dict(self._profiles)
+
+    def to_prometheus(self) -> str:
+        """
+        Renders the counters in the Prometheus text exposition format.
+        """
+        with self._lock:
+            stats = {name: dict(entry) for name, entry in self._stats.items()}
+
+        def label(name: str) -> str:
+            escaped = (
+                name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            )
+            return f'query="{escaped}"'
+
+        histogram = "dashboard_query_duration_seconds"
+        lines = [
+            f"# HELP {histogram} Wall time of queries executed in DuckDB.",
+            f"# TYPE {histogram} histogram",
+        ]
+        for name, entry in sorted(stats.items()):
+            labels = label(name)
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                lines.append(f'{histogram}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{histogram}_bucket{{{labels},le="+Inf"}} {entry["count"]}')
+            lines.append(f"{histogram}_sum{{{labels}}} {entry['seconds']}")
+            lines.append(f"{histogram}_count{{{labels}}} {entry['count']}")
+
+        for metric, key, help_text in (
+            ("dashboard_query_rows_total", "rows", "Rows returned by DuckDB."),
+            ("dashboard_query_bytes_total", "bytes", "Arrow bytes materialized."),
+            (
+                "dashboard_query_cache_hits_total",
+                "cache_hits",
+                "Results served from the cache.",
+            ),
+            ("dashboard_query_errors_total", "errors", "Failed queries."),
+            (
+                "dashboard_query_slow_total",
+                "slow",
+                "Queries slower than the slow query threshold.",
+            ),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, entry in sorted(stats.items()):
+                lines.append(f"{metric}{{{label(name)}}} {entry[key]}")
+        return "\n".join(lines) + "\n"
+
+
+_query_cache = QueryCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+_connection_pool = ConnectionPool(DB_PATH, SERVE_PROFILE)
+query_stats = QueryStats(QUERY_DURATION_BUCKETS)
+
+# Queries read _connection_pool and _query_cache together under this lock, so a
+# WarehouseRefresher switching both to a new build never pairs one build's cache
+# with the other's connection.
+_serving_lock = threading.Lock()
+# Connection pool and result cache of the build the refresher is prewarming, set on
+# its own thread only.
+_staging = threading.local()
+
+# Background worker that profiles slow queries without delaying the response.
+_profile_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="query-profile"
+)
+
+
+def _current_build() -> Tuple[ConnectionPool, QueryCache, bool]:
+    """
+    Returns the connection pool and result cache queries run on, and whether they
+    belong to a build being prewarmed on this thread.
+    """
+    staged = getattr(_staging, "build", None)
+    if staged is not None:
+        return staged[0], staged[1], True
+    with _serving_lock:
+        return _connection_pool, _query_cache, False
+
+
+def _profile_query(
+    pool: ConnectionPool,
+    name: str,
+    query: str,
+    params: tuple,
+    version: Optional[Tuple[int, ...]],
+    seconds: float,
+) -> None:
+    profile = None
+    try:
+        with pool.open_cursor(version) as cursor:
+            rows = cursor.execute(f"EXPLAIN ANALYZE {query}", params).fetchall()
+        profile = rows[0][1]
+        logging.warning(f"Slow query {name} took {seconds:.3f}s:\n{profile}")
+    except Exception as e:
+        logging.error(f"Error profiling slow query {name}: {e}")
+    finally:
+        query_stats.finish_profile(name, seconds, profile)
+
+
+def _wrap_query(
+    query: str, columns: Optional[Sequence[str]], limit: Optional[int]
+) -> Tuple[str, tuple]:
+    """
+    Applies a column projection and a row limit on top of a query. DuckDB pushes both
+    down into the query plan, so unneeded columns and rows are never materialized.
+    """
+    if columns is None and limit is None:
+        return query, ()
+    projection = ", ".join(f'"{column}"' for column in columns) if columns else "*"
+    wrapped = f"SELECT {projection} FROM ({query.strip().rstrip(';')}) AS q"
+    if limit is None:
+        return wrapped, ()
+    return f"{wrapped} LIMIT ?", (limit,)
+
+
+def _pandas_types_mapper(
+    arrow_type: pa.DataType,
+) -> Optional[pd.api.extensions.ExtensionDtype]:
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def _plain_type(arrow_type: pa.DataType) -> pa.DataType:
+    if pa.types.is_decimal(arrow_type):
+        return pa.float64()
+    if pa.types.is_dictionary(arrow_type):
+        return arrow_type.value_type
+    return arrow_type
+
 
-def execute_query(query: str, params: tuple = ()) -> Optional[pd.DataFrame]:
+def plain_arrow_types(table: pa.Table) -> pa.Table:
     """
-    Executes an SQL query in DuckDB and returns the result as a Pandas DataFrame.
+    Casts the DECIMAL money columns of the warehouse to floats and its ENUM columns,
+    which arrive dictionary-encoded, to plain strings, the types charts and tables
+    expect.
+    """
+    schema = pa.schema(
+        [field.with_type(_plain_type(field.type)) for field in table.schema]
+    )
+    return table.cast(schema) if schema != table.schema else table
+
+
+def arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Converts an Arrow table to pandas. Numeric columns without nulls are converted
+    without copying where possible, string and ENUM columns become Arrow-backed
+    strings instead of Python objects or categoricals, decimals become floats and
+    dates become datetime64, matching DuckDB's own ``.df()``.
+    """
+    table = plain_arrow_types(table)
+    return table.to_pandas(
+        types_mapper=_pandas_types_mapper, date_as_object=False, split_blocks=True
+    )
+
+
+def execute_query(
+    query: str,
+    params: tuple = (),
+    use_cache: bool = True,
+    output: str = "pandas",
+    columns: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    name: str = "unnamed",
+) -> Optional[Union[pd.DataFrame, pa.Table]]:
+    """
+    Executes an SQL query in DuckDB and returns the result as a Pandas DataFrame or
+    an Arrow table.
+
+    Results are fetched as Arrow and cached per query text, parameters, projection,
+    limit and output format until they expire, are evicted, or the warehouse file
+    changes. Failed queries are never cached. Cached results are shared between
+    callers and must not be modified in place.
+
+    Wall time, rows, Arrow bytes, cache hits and errors are recorded in query_stats
+    under the query name. Queries slower than SLOW_QUERY_SECONDS are profiled with
+    EXPLAIN ANALYZE in the background.
 
     Args:
         query (str): The SQL query to execute.
         params (tuple, optional): Query parameters (default is an empty tuple).
+        use_cache (bool, optional): Whether to read and fill the result cache (default is True).
+        output (str, optional): "pandas" for a DataFrame or "arrow" for a pyarrow Table (default is "pandas").
+        columns (Sequence[str], optional): Only return these result columns (default is all).
+        limit (int, optional): Only return this many rows (default is all).
+        name (str, optional): Name the query is recorded under (default is "unnamed").
 
     Returns:
-        Optional[pd.DataFrame]: The query result as a DataFrame, or None if empty.
+        Optional[Union[pd.DataFrame, pa.Table]]: The query result, or None if empty
+        or failed.
     """
+    if output not in ("pandas", "arrow"):
+        raise ValueError(f"Unsupported output format: {output}")
+
+    pool, cache, staged = _current_build()
+    version = pool.warehouse_version()
+    query, extra_params = _wrap_query(query, columns, limit)
+    params = tuple(params) + extra_params
+    key = (query, params, output)
+
+    if use_cache:
+        hit, result = cache.get(key, version)
+        if hit:
+            query_stats.record_cache_hit(name)
+            return result
+
+    start = time.perf_counter()
     try:
-        with duckdb.connect(DB_PATH) as conn:
-            result = conn.execute(query, params).df()
-            return result if not result.empty else None
+        with pool.borrow(version) as conn:
+            table = conn.execute(query, params).fetch_arrow_table()
     except Exception as e:
-        logging.error(f"Error executing query: {e}")
+        query_stats.record_error(name)
+        if staged:
+            # Fails the prewarm, so the refresher stays on the current build.
+            raise
+        if isinstance(e, (duckdb.IOException, duckdb.ConnectionException)):
+            logging.error(
+                f"Error executing query {name}, reconnecting on next query: {e}"
+            )
+            pool.reset()
+        else:
+            logging.error(f"Error executing query {name}: {e}")
         return None
 
+    if table.num_rows == 0:
+        result = None
+    elif output == "arrow":
+        result = table
+    else:
+        result = arrow_to_pandas(table)
+
+    seconds = time.perf_counter() - start
+    query_stats.record(name, seconds, table.num_rows, table.nbytes)
+    if seconds >= SLOW_QUERY_SECONDS and query_stats.start_profile(name):
+        _profile_executor.submit(
+            _profile_query, pool, name, query, params, version, seconds
+        )
+
+    if use_cache:
+        cache.put(key, version, result)
+    return result
+
+
+def iter_query_batches(
+    query: str, params: tuple = (), batch_size: int = 100_000
+) -> Iterator[pa.RecordBatch]:
+    """
+    Streams the result of an SQL query as Arrow record batches, for result sets too
+    large to materialize at once. Runs on its own cursor and bypasses the cache.
+
+    Args:
+        query (str): The SQL query to execute.
+        params (tuple, optional): Query parameters (default is an empty tuple).
+        batch_size (int, optional): Maximum number of rows per batch (default is 100,000).
+
+    Yields:
+        pa.RecordBatch: The next batch of result rows.
+    """
+    pool = _current_build()[0]
+    with pool.open_cursor(pool.warehouse_version()) as cursor:
+        reader = cursor.execute(query, params).fetch_record_batch(batch_size)
+        yield from reader
+
+
+# Long-lived workers for run_batch(), so each keeps its pooled cursor between batches.
+# Each worker marks itself in _batch_worker, see run_batch().
+_batch_worker = threading.local()
+
+
+def _mark_batch_worker() -> None:
+    _batch_worker.active = True
+
+
+_batch_executor = ThreadPoolExecutor(
+    max_workers=BATCH_MAX_WORKERS,
+    thread_name_prefix="query-batch",
+    initializer=_mark_batch_worker,
+)
+
+
+def _timed_call(
+    func: Callable[..., Optional[pd.DataFrame]], kwargs: Dict[str, Any]
+) -> Tuple[Optional[pd.DataFrame], float]:
+    start = time.perf_counter()
+    result = func(**kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_batch(
+    calls: Dict[str, Tuple[Callable[..., Optional[pd.DataFrame]], Dict[str, Any]]],
+) -> Dict[str, Tuple[Optional[pd.DataFrame], float]]:
+    """
+    Runs several query functions concurrently on the shared batch thread pool, each
+    worker on its own pooled DuckDB cursor, so the batch takes about as long as its
+    slowest query rather than the sum of all of them.
+
+    A query function that itself calls run_batch() would wait on the pool from one of
+    its workers, and deadlock once every worker waits. Called on a batch worker,
+    run_batch() therefore runs the calls one after another on that worker.
+
+    Args:
+        calls (Dict[str, Tuple[Callable, Dict[str, Any]]]): Query function and keyword
+            arguments, by name, e.g. {"kpis": (get_kpis, {"filters": filters})}.
+
+    Returns:
+        Dict[str, Tuple[Optional[pd.DataFrame], float]]: Result and wall time in
+        seconds, by name.
+    """
+    if getattr(_batch_worker, "active", False):
+        return {
+            name: _timed_call(func, kwargs) for name, (func, kwargs) in calls.items()
+        }
+    futures = {
+        name: _batch_executor.submit(_timed_call, func, kwargs)
+        for name, (func, kwargs) in calls.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _is_write_locked(db_path: str) -> bool:
+    """
+    Checks whether another process holds the write lock on a DuckDB file, as the
+    importer and dbt do for as long as they have the warehouse open. Call it holding
+    _live_file_lock exclusively: closing the file drops this process's locks on it.
+    """
+    with open(db_path, "rb") as f:
+        try:
+            fcntl.lockf(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.lockf(f, fcntl.LOCK_UN)
+    return False
+
+
+def _is_serving(pid: int) -> bool:
+    """
+    Returns whether another process with the given id is running, so its snapshots
+    may still be in use.
+    """
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove_snapshot(path: str) -> None:
+    for file in (path, f"{path}.wal"):
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass
+
+
+class WarehouseRefresher:
+    """
+    Background thread that moves the dashboard over to new warehouse builds without a
+    restart and without users ever querying a cold or half-written build.
+
+    Every REFRESH_INTERVAL_SECONDS it reads the version of the warehouse file. A new
+    version is picked up once no process holds its write lock and it has not changed
+    for REFRESH_SETTLE_SECONDS, so a build still being written by the importer or dbt
+    is left alone. The file is copied to a snapshot in the snapshot directory, and a
+    connection pool and result cache are opened on the copy and warmed off the
+    request path: first with the prewarm callable, then with the most recently used
+    queries of the build being served. Only then are the pool and cache switched in,
+    together, so every query runs entirely on the old build or entirely on the new
+    one. Queries already running on the old build finish on it. A build that fails to
+    prewarm is skipped until the file changes again. After a switch the next build is
+    not copied for REFRESH_MIN_INTERVAL_SECONDS.
+
+    Each switch costs a full copy of the warehouse file, and the snapshot directory
+    needs room for two copies per serving process: the one being served and the one
+    being warmed. Snapshots are named after the process, so several serving processes
+    can share the directory.
+
+    Reading from a private copy also means the dashboard never holds a lock on the
+    warehouse file itself, which would stop the importer and dbt from writing to it.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        snapshot_dir: str,
+        prewarm: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """
+        Args:
+            db_path (str): The warehouse file written by the importer and dbt.
+            snapshot_dir (str): Directory the snapshots are copied to.
+            prewarm (Callable, optional): Runs the queries every build is warmed
+                with, on the refresher thread (default is none).
+        """
+        self.db_path = db_path
+        self.snapshot_dir = snapshot_dir
+        self.prewarm = prewarm
+        # Version of the warehouse file the served snapshot was copied from.
+        self.version: Optional[Tuple[int, ...]] = None
+        self._snapshot: Optional[str] = None
+        self._snapshot_count = 0
+        self._switched_at: Optional[float] = None
+        # New version of the file and when it was first seen.
+        self._candidate: Optional[Tuple[Tuple[int, ...], float]] = None
+        self._rejected: Optional[Tuple[int, ...]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "WarehouseRefresher":
+        """
+        Starts checking for new builds in the background, the first check right away.
+        Until the first switch succeeds, queries read the warehouse file directly.
+        """
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        for name in os.listdir(self.snapshot_dir):
+            match = re.fullmatch(r"analytics-(\d+)-\d+\.duckdb(\.wal)?", name)
+            if match is not None and not _is_serving(int(match.group(1))):
+                os.remove(os.path.join(self.snapshot_dir, name))
+        self._thread = threading.Thread(
+            target=self._run, name="warehouse-refresh", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops checking for new builds. The current one keeps being served.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        self._refresh_safely()
+        while not self._stop.wait(REFRESH_INTERVAL_SECONDS):
+            self._refresh_safely()
+
+    def _refresh_safely(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.error(f"Error refreshing the warehouse: {e}")
+
+    def refresh(self) -> bool:
+        """
+        Switches to the build in the warehouse file if it is new, finished and
+        prewarms without errors.
+
+        Returns:
+            bool: Whether a new build was switched in.
+        """
+        global _connection_pool, _query_cache
+        version = get_warehouse_version(self.db_path)
+        if version is None or version in (self.version, self._rejected):
+            return False
+        now = time.monotonic()
+        if (
+            self._switched_at is not None
+            and now - self._switched_at < REFRESH_MIN_INTERVAL_SECONDS
+        ):
+            return False
+        if self._candidate is None or self._candidate[0] != version:
+            self._candidate = (version, now)
+        # The first build is taken as soon as it is unlocked, so the dashboard does
+        # not start on the warehouse file itself.
+        settling = now - self._candidate[1] < REFRESH_SETTLE_SECONDS
+        if self.version is not None and settling:
+            return False
+
+        start = time.perf_counter()
+        # Waits for queries on the live file, whose locks the probe and the copy would
+        # otherwise drop, and holds off new ones until the copy is taken.
+        with _live_file_lock.exclusive():
+            if _is_write_locked(self.db_path):
+                return False
+            self._snapshot_count += 1
+            snapshot = os.path.join(
+                self.snapshot_dir,
+                f"analytics-{os.getpid()}-{self._snapshot_count}.duckdb",
+            )
+            try:
+                shutil.copyfile(self.db_path, snapshot)
+                if os.path.exists(f"{self.db_path}.wal"):
+                    shutil.copyfile(f"{self.db_path}.wal", f"{snapshot}.wal")
+            except FileNotFoundError:
+                pass
+        if get_warehouse_version(self.db_path) != version:
+            # Written to while being copied; retried once it settles again.
+            _remove_snapshot(snapshot)
+            return False
+
+        pool = ConnectionPool(snapshot, _connection_pool.config, version)
+        cache = QueryCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+        try:
+            self._prewarm(pool, cache)
+        except Exception as e:
+            logging.error(f"Keeping the current warehouse build, prewarm failed: {e}")
+            self._rejected = version
+            _remove_snapshot(snapshot)
+            return False
 
-def get_sales_over_time() -> Optional[pd.DataFrame]:
+        with _serving_lock:
+            _connection_pool, _query_cache = pool, cache
+        previous, self._snapshot, self.version = self._snapshot, snapshot, version
+        self._switched_at = time.monotonic()
+        if previous is not None:
+            # Connections still open on the old snapshot keep reading it until the
+            # last query on them finishes.
+            _remove_snapshot(previous)
+        logging.info(
+            f"Switched to a new warehouse build, copied and prewarmed in "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+        return True
+
+    def _prewarm(self, pool: ConnectionPool, cache: QueryCache) -> None:
+        keys = _current_build()[1].recent_keys(PREWARM_MAX_QUERIES)
+        _staging.build = (pool, cache)
+        try:
+            if self.prewarm is not None:
+                self.prewarm()
+            for query, params, output in keys:
+                execute_query(query, params, output=output, name="prewarm")
+        finally:
+            _staging.build = None
+
+
+_refresher: Optional[Tuple[int, WarehouseRefresher]] = None
+_refresher_lock = threading.Lock()
+
+
+def ensure_warehouse_refresher(
+    prewarm: Optional[Callable[[], Any]] = None,
+) -> WarehouseRefresher:
+    """
+    Starts the WarehouseRefresher of the calling process unless it is already running.
+    Cheap enough to call on every request, so each process that serves requests starts
+    exactly one, whatever the server: a process forked after it started, such as a
+    gunicorn worker of a preloaded app, starts its own, since the refresher thread
+    does not survive the fork.
+
+    Args:
+        prewarm (Callable, optional): Runs the queries every build is warmed with
+            (default is none).
+
+    Returns:
+        WarehouseRefresher: The refresher of the calling process.
+    """
+    global _refresher
+    pid = os.getpid()
+    refresher = _refresher
+    if refresher is not None and refresher[0] == pid:
+        return refresher[1]
+    with _refresher_lock:
+        if _refresher is None or _refresher[0] != pid:
+            _refresher = (
+                pid,
+                WarehouseRefresher(DB_PATH, SNAPSHOT_DIR, prewarm=prewarm).start(),
+            )
+        return _refresher[1]
+
+
+# Dashboard filters, as produced by the filter bar: start_date and end_date are
+# ISO dates, region, segment and category are a value or a list of values. Missing
+# or empty entries do not filter.
+Filters = Optional[Dict[str, Any]]
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def has_filters(filters: Filters) -> bool:
+    """
+    Checks whether any dashboard filter is set.
+    """
+    return bool(filters) and any(_as_list(value) for value in filters.values())
+
+
+def build_filter_clause(
+    filters: Filters, alias: str, grain: str = "order"
+) -> Tuple[str, tuple]:
+    """
+    Translates dashboard filters into an SQL WHERE clause over a fact table.
+
+    Dimension filters are applied as key subqueries, so filtering never changes the
+    grain of the fact rows being aggregated.
+
+    Args:
+        filters (Filters): The dashboard filters.
+        alias (str): Alias of the fact table in the query.
+        grain (str): "order" for fact_orders, "item" for fact_order_items.
+
+    Returns:
+        Tuple[str, tuple]: The WHERE clause (empty if no filter is set) and its parameters.
+    """
+    filters = filters or {}
+    conditions: List[str] = []
+    params: List[Any] = []
+
+    if filters.get("start_date"):
+        conditions.append(f"{alias}.order_date >= ?")
+        params.append(filters["start_date"])
+    if filters.get("end_date"):
+        conditions.append(f"{alias}.order_date <= ?")
+        params.append(filters["end_date"])
+
+    def add_in(column: str, subquery: str, values: List[Any]) -> None:
+        placeholders = ", ".join("?" for _ in values)
+        conditions.append(f"{alias}.{column} IN ({subquery} IN ({placeholders}))")
+        params.extend(values)
+
+    regions = _as_list(filters.get("region"))
+    if regions:
+        add_in(
+            "location_id",
+            "SELECT location_id FROM main_analytics.dim_location WHERE region",
+            regions,
+        )
+
+    segments = _as_list(filters.get("segment"))
+    if segments:
+        add_in(
+            "customer_sk",
+            "SELECT customer_sk FROM main_analytics.dim_customers WHERE segment",
+            segments,
+        )
+
+    categories = _as_list(filters.get("category"))
+    if categories and grain == "item":
+        add_in(
+            "product_sk",
+            "SELECT product_sk FROM main_analytics.dim_products WHERE category",
+            categories,
+        )
+    elif categories:
+        add_in(
+            "order_id",
+            """SELECT foi.order_id
+            FROM main_analytics.fact_order_items foi
+            JOIN main_analytics.dim_products p ON foi.product_sk = p.product_sk
+            WHERE p.category""",
+            categories,
+        )
+
+    if not conditions:
+        return "", ()
+    return "WHERE " + "\n      AND ".join(conditions), tuple(params)
+
+
+def get_filter_options() -> Dict[str, Any]:
     """
-    Retrieves total sales and profit aggregated monthly.
+    Retrieves the values offered by the dashboard filter bar.
+
+    Returns:
+        Dict[str, Any]: The available regions, segments and categories, and the
+        first and last order dates.
+    """
+    options: Dict[str, Any] = {}
+    for name, query in (
+        ("region", "SELECT DISTINCT region FROM main_analytics.dim_location"),
+        ("segment", "SELECT DISTINCT segment FROM main_analytics.dim_customers"),
+        ("category", "SELECT DISTINCT category FROM main_analytics.dim_products"),
+    ):
+        result = execute_query(f"{query} ORDER BY 1", name=f"filter_options_{name}")
+        options[name] = (
+            result.iloc[:, 0].dropna().tolist() if result is not None else []
+        )
+
+    dates = execute_query(
+        "SELECT MIN(order_date) AS min_date, MAX(order_date) AS max_date "
+        "FROM main_analytics.fact_orders",
+        name="filter_options_dates",
+    )
+    options["min_date"] = dates.iloc[0, 0] if dates is not None else None
+    options["max_date"] = dates.iloc[0, 1] if dates is not None else None
+    return options
+
+
+# Scalar KPIs are computed by get_kpis() in a single scan of fact_orders. The
+# aggregates below are evaluated once each, and every KPI is an expression over them,
+# so adding a KPI card costs a new entry here rather than another table scan.
+KPI_AGGREGATES: Dict[str, str] = {
+    "order_rows": "COUNT(*)",
+    "returned_orders": "SUM(CASE WHEN is_return_order THEN 1 ELSE 0 END)",
+    "distinct_orders": "COUNT(DISTINCT order_id)",
+    "distinct_customers": "COUNT(DISTINCT customer_sk)",
+    "total_sales": "SUM(adjusted_sales)",
+    "total_profit": "SUM(adjusted_profit)",
+    "mean_delivery_time": "AVG(avg_delivery_time)",
+}
+
+KPI_METRICS: Dict[str, str] = {
+    "return_rate": "returned_orders * 100.0 / order_rows",
+    "total_orders_returned": "returned_orders",
+    "return_rate_per_customer": "returned_orders * 100.0 / distinct_customers",
+    "total_orders": "distinct_orders",
+    "total_customers": "distinct_customers",
+    "avg_ticket": "total_sales / distinct_customers",
+    "avg_orders_per_customer": "distinct_orders * 1.0 / distinct_customers",
+    "avg_delivery_time": "mean_delivery_time",
+    "contribution_margin": "total_profit * 100.0 / total_sales",
+    "net_revenue": "COALESCE(total_sales, 0)",
+    "effective_profit_margin": """
+        CASE
+            WHEN total_sales > 0
+            THEN (total_profit * 100.0) / total_sales
+            ELSE 0
+        END""",
+}
+
+
+# Approximate counterparts of the distinct counts in KPI_AGGREGATES.
+APPROXIMATE_KPI_AGGREGATES: Dict[str, str] = {
+    "distinct_orders": "approx_count_distinct(order_id)",
+    "distinct_customers": "approx_count_distinct(customer_sk)",
+}
+
+# KPI_AGGREGATES over the rows of agg_kpis_daily. Distinct counts are estimated from
+# the merged registers of the sketch columns in KPI_SKETCHES, see _hll_estimate().
+SKETCH_KPI_AGGREGATES: Dict[str, str] = {
+    "order_rows": "COALESCE(SUM(order_rows), 0)",
+    "returned_orders": "SUM(returned_orders)",
+    "total_sales": "SUM(total_sales)",
+    "total_profit": "SUM(total_profit)",
+    "mean_delivery_time": "SUM(delivery_time_sum) / SUM(delivery_time_count)",
+}
+
+KPI_SKETCHES: Dict[str, str] = {
+    "distinct_orders": "order_sketch",
+    "distinct_customers": "customer_sketch",
+}
+
+
+def _hll_estimate(registers: str) -> str:
+    """
+    Returns a scalar subquery estimating the distinct count of a HyperLogLog sketch
+    from a relation of its (bucket, rho) registers, with the small range correction.
+    """
+    m = 1 << HLL_PRECISION
+    alpha = 0.7213 / (1 + 1.079 / m)
+    return f"""(
+        SELECT
+            CASE
+                WHEN zeros > 0 AND raw <= {2.5 * m} THEN {m} * ln({m}.0 / zeros)
+                ELSE raw
+            END
+        FROM (
+            SELECT
+                {m} - COUNT(*) AS zeros,
+                {alpha * m * m} / (
+                    {m} - COUNT(*) + COALESCE(SUM(pow(2.0, -CAST(rho AS INTEGER))), 0)
+                ) AS raw
+            FROM {registers}
+        )
+    )"""
+
+
+def _sketch_filter_clause(filters: Filters) -> Tuple[str, tuple]:
+    """
+    Translates dashboard filters into a WHERE clause over agg_kpis_daily, which is
+    keyed by order date, region and segment.
+    """
+    filters = filters or {}
+    conditions: List[str] = []
+    params: List[Any] = []
+    if filters.get("start_date"):
+        conditions.append("order_date >= ?")
+        params.append(filters["start_date"])
+    if filters.get("end_date"):
+        conditions.append("order_date <= ?")
+        params.append(filters["end_date"])
+    for column in ("region", "segment"):
+        values = _as_list(filters.get(column))
+        if values:
+            conditions.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+
+    if not conditions:
+        return "", ()
+    return "WHERE " + "\n      AND ".join(conditions), tuple(params)
+
+
+def get_kpis(
+    filters: Filters = None, approximate: Optional[bool] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Computes every KPI in KPI_METRICS in a single pass over fact_orders.
+
+    With approximate distinct counts, the KPIs are computed from the daily sketches
+    of agg_kpis_daily instead, unless a category filter is set, which the sketches
+    are not keyed by; fact_orders is then scanned with approx_count_distinct().
+
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+        approximate (Optional[bool]): Whether to approximate distinct counts
+            (default is APPROXIMATE_DISTINCT_COUNTS).
+
+    Returns:
+        Optional[pd.DataFrame]: DataFrame with a single row and one column per KPI.
+    """
+    if approximate is None:
+        approximate = APPROXIMATE_DISTINCT_COUNTS
+    metrics = ",\n    ".join(
+        f"{expression} AS {name}" for name, expression in KPI_METRICS.items()
+    )
+
+    if approximate and not _as_list((filters or {}).get("category")):
+        registers = "".join(
+            f"""
+        {column}_registers AS (
+            SELECT r.bucket, MAX(r.rho) AS rho
+            FROM (SELECT unnest({column}) AS r FROM days)
+            GROUP BY 1
+        ),"""
+            for column in KPI_SKETCHES.values()
+        )
+        sums = ",\n            ".join(
+            [
+                f"{expression} AS {name}"
+                for name, expression in SKETCH_KPI_AGGREGATES.items()
+            ]
+            + [
+                f"{_hll_estimate(f'{column}_registers')} AS {name}"
+                for name, column in KPI_SKETCHES.items()
+            ]
+        )
+        where, params = _sketch_filter_clause(filters)
+        query = f"""
+        WITH days AS (
+            SELECT *
+            FROM main_analytics.agg_kpis_daily
+            {where}
+        ),{registers}
+        aggregates AS (
+            SELECT
+            {sums}
+            FROM days
+        )
+        SELECT
+        {metrics}
+        FROM aggregates;
+        """
+        return execute_query(query, params, name="get_kpis_approximate")
+
+    aggregate_expressions = dict(KPI_AGGREGATES)
+    if approximate:
+        aggregate_expressions.update(APPROXIMATE_KPI_AGGREGATES)
+    aggregates = ",\n        ".join(
+        f"{expression} AS {name}" for name, expression in aggregate_expressions.items()
+    )
+    where, params = build_filter_clause(filters, "f")
+    query = f"""
+    WITH aggregates AS (
+        SELECT
+        {aggregates}
+        FROM main_analytics.fact_orders f
+        {where}
+    )
+    SELECT
+    {metrics}
+    FROM aggregates;
+    """
+    return execute_query(
+        query, params, name="get_kpis_approximate" if approximate else "get_kpis"
+    )
+
+
+def _select_kpis(
+    *names: str, filters: Filters = None, approximate: Optional[bool] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Returns the given KPI columns from the result of get_kpis().
+    """
+    kpis = get_kpis(filters, approximate)
+    return kpis[list(names)] if kpis is not None else None
+
+
+def get_sales_over_time(filters: Filters = None) -> Optional[pd.DataFrame]:
+    """
+    Retrieves total sales and profit aggregated monthly, from the agg_sales_monthly
+    rollup, or from fact_orders when filters are set.
+
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
 
     Returns:
         Optional[pd.DataFrame]: DataFrame with columns [month, total_sales, total_profit].
     """
-    query = """
+    if not has_filters(filters):
+        query = """
+        SELECT month, total_sales, total_profit
+        FROM main_analytics.agg_sales_monthly
+        ORDER BY month
+        """
+        return execute_query(query, name="get_sales_over_time")
+
+    where, params = build_filter_clause(filters, "f")
+    query = f"""
     SELECT 
-        strftime('%Y-%m', order_date) AS month,
-        SUM(adjusted_sales) AS total_sales,
-        SUM(adjusted_profit) AS total_profit
-    FROM main_analytics.fact_orders
+        strftime('%Y-%m', f.order_date) AS month,
+        SUM(f.adjusted_sales) AS total_sales,
+        SUM(f.adjusted_profit) AS total_profit
+    FROM main_analytics.fact_orders f
+    {where}
     GROUP BY 1
     ORDER BY 1
     """
-    return execute_query(query)
+    return execute_query(query, params, name="get_sales_over_time")
 
 
-def get_top_categories(limit: int = 10) -> Optional[pd.DataFrame]:
+def get_top_categories(
+    limit: int = 10, filters: Filters = None
+) -> Optional[pd.DataFrame]:
     """
-    Retrieves the top-selling product categories.
+    Retrieves the top-selling product categories, from the agg_sales_by_category
+    rollup, or from fact_order_items when filters are set.
 
     Args:
         limit (int): Number of top categories to return (default is 10).
+        filters (Filters): Dashboard filters to apply (default is None).
 
     Returns:
         Optional[pd.DataFrame]: DataFrame with columns [category, total_sales, total_profit].
     """
-    query = """
+    if not has_filters(filters):
+        query = """
+        SELECT category, total_sales, total_profit
+        FROM main_analytics.agg_sales_by_category
+        ORDER BY total_sales DESC
+        LIMIT ?
+        """
+        return execute_query(query, (limit,), name="get_top_categories")
+
+    where, params = build_filter_clause(filters, "foi", grain="item")
+    query = f"""
     SELECT 
         p.category,
         SUM(foi.adjusted_sales) AS total_sales,
         SUM(foi.adjusted_profit) AS total_profit
     FROM main_analytics.fact_order_items foi
     JOIN main_analytics.dim_products p ON foi.product_sk = p.product_sk
+    {where}
     GROUP BY 1
     ORDER BY 2 DESC
     LIMIT ?
     """
-    return execute_query(query, (limit,))
+    return execute_query(query, params + (limit,), name="get_top_categories")
 
 
-def get_return_rate() -> Optional[pd.DataFrame]:
+def get_return_rate(filters: Filters = None) -> Optional[pd.DataFrame]:
     """
     Calculates the overall order return rate.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [return_rate].
     """
-    query = """
-    SELECT 
-        SUM(CASE WHEN is_return_order THEN 1 ELSE 0 END) * 100.0 / COUNT(*) AS return_rate
-    FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis("return_rate", filters=filters)
 
 
-def get_return_rate_per_customer() -> Optional[pd.DataFrame]:
+def get_return_rate_per_customer(
+    filters: Filters = None, approximate: Optional[bool] = None
+) -> Optional[pd.DataFrame]:
     """
     Calculates the return rate per unique customer.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+        approximate (Optional[bool]): Whether to approximate distinct counts
+            (default is APPROXIMATE_DISTINCT_COUNTS).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [return_rate_per_customer].
     """
-    query = """
-    SELECT 
-        SUM(CASE WHEN is_return_order THEN 1 ELSE 0 END) * 100.0 / COUNT(DISTINCT customer_sk) AS return_rate_per_customer
-    FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis(
+        "return_rate_per_customer", filters=filters, approximate=approximate
+    )
 
 
-def get_top_return_customers(limit: int = 5) -> Optional[pd.DataFrame]:
+def get_top_return_customers(
+    limit: int = 5,
+    filters: Filters = None,
+    output: str = "pandas",
+    approximate: Optional[bool] = None,
+) -> Optional[Union[pd.DataFrame, pa.Table]]:
     """
-    Retrieves the top 5 customers with the highest return rate.
+    Retrieves the top 5 customers with the highest return rate, from the
+    mart_customer_returns mart, or from fact_orders when filters are set.
 
     Args:
         limit (int): Number of customers to return (default is 5).
+        filters (Filters): Dashboard filters to apply (default is None).
+        output (str): "pandas" or "arrow" (default is "pandas").
+        approximate (Optional[bool]): Whether to count orders with
+            approx_count_distinct() when filters are set (default is
+            APPROXIMATE_DISTINCT_COUNTS).
 
     Returns:
-        Optional[pd.DataFrame]: DataFrame with columns [customer_name, total_orders, returned_orders, return_rate].
+        Optional[Union[pd.DataFrame, pa.Table]]: Result with columns [customer_name, total_orders, returned_orders, return_rate].
     """
-    query = """
+    if not has_filters(filters):
+        query = """
+        SELECT customer_name, total_orders, returned_orders, return_rate
+        FROM main_analytics.mart_customer_returns
+        WHERE total_orders > 5
+        ORDER BY return_rate DESC, total_orders DESC, customer_sk
+        LIMIT ?
+        """
+        return execute_query(
+            query, (limit,), output=output, name="get_top_return_customers"
+        )
+
+    if approximate is None:
+        approximate = APPROXIMATE_DISTINCT_COUNTS
+    count_distinct = "approx_count_distinct(" if approximate else "COUNT(DISTINCT "
+    total_orders = f"{count_distinct}f.order_id)"
+    returned_orders = (
+        f"{count_distinct}CASE WHEN f.is_return_order THEN f.order_id END)"
+    )
+    where, params = build_filter_clause(filters, "f")
+    query = f"""
     SELECT 
         c.customer_name,
-        COUNT(DISTINCT f.order_id) AS total_orders,
-        COUNT(DISTINCT CASE WHEN f.is_return_order THEN f.order_id END) AS returned_orders,
+        {total_orders} AS total_orders,
+        {returned_orders} AS returned_orders,
         ROUND(
-            COUNT(DISTINCT CASE WHEN f.is_return_order THEN f.order_id END) * 100.0 
-            / COUNT(DISTINCT f.order_id), 2
+            {returned_orders} * 100.0 
+            / {total_orders}, 2
         ) AS return_rate
     FROM main_analytics.fact_orders f
     JOIN main_analytics.dim_customers c ON f.customer_sk = c.customer_sk
-    GROUP BY c.customer_name
-    HAVING COUNT(DISTINCT f.order_id) > 5  
-    ORDER BY return_rate DESC
+    {where}
+    GROUP BY c.customer_sk, c.customer_name
+    HAVING {total_orders} > 5  
+    ORDER BY return_rate DESC, total_orders DESC, c.customer_sk
     LIMIT ?;
     """
-    return execute_query(query, (limit,))
+    return execute_query(
+        query, params + (limit,), output=output, name="get_top_return_customers"
+    )
 
 
-def get_return_metrics() -> Optional[pd.DataFrame]:
+def get_return_metrics(filters: Filters = None) -> Optional[pd.DataFrame]:
     """
     Retrieves total returned orders and return rate per customer.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with columns [total_orders_returned, return_rate_per_customer].
     """
-    query = """
-    SELECT 
-        SUM(CASE WHEN is_return_order THEN 1 ELSE 0 END) AS total_orders_returned,
-        SUM(CASE WHEN is_return_order THEN 1 ELSE 0 END) * 100.0 / COUNT(DISTINCT customer_sk) AS return_rate_per_customer
-    FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis(
+        "total_orders_returned", "return_rate_per_customer", filters=filters
+    )
 
 
-def get_total_orders() -> Optional[pd.DataFrame]:
+def get_total_orders(filters: Filters = None) -> Optional[pd.DataFrame]:
     """
     Retrieves the total number of unique orders.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [total_orders].
     """
-    query = "SELECT COUNT(DISTINCT order_id) AS total_orders FROM main_analytics.fact_orders;"
-    return execute_query(query)
+    return _select_kpis("total_orders", filters=filters)
 
 
-def get_total_customers() -> Optional[pd.DataFrame]:
+def get_total_customers(
+    filters: Filters = None, approximate: Optional[bool] = None
+) -> Optional[pd.DataFrame]:
     """
     Retrieves the total number of unique customers.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+        approximate (Optional[bool]): Whether to approximate distinct counts
+            (default is APPROXIMATE_DISTINCT_COUNTS).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [total_customers].
     """
-    query = "SELECT COUNT(DISTINCT customer_sk) AS total_customers FROM main_analytics.fact_orders;"
-    return execute_query(query)
+    return _select_kpis("total_customers", filters=filters, approximate=approximate)
 
 
-def get_avg_ticket() -> Optional[pd.DataFrame]:
+def get_avg_ticket(
+    filters: Filters = None, approximate: Optional[bool] = None
+) -> Optional[pd.DataFrame]:
     """
     Calculates the average revenue per customer.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+        approximate (Optional[bool]): Whether to approximate distinct counts
+            (default is APPROXIMATE_DISTINCT_COUNTS).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [avg_ticket].
     """
-    query = """
-    SELECT SUM(adjusted_sales) / COUNT(DISTINCT customer_sk) AS avg_ticket
-    FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis("avg_ticket", filters=filters, approximate=approximate)
 
 
-def get_avg_orders_per_customer() -> Optional[pd.DataFrame]:
+def get_avg_orders_per_customer(
+    filters: Filters = None, approximate: Optional[bool] = None
+) -> Optional[pd.DataFrame]:
     """
     Calculates the average number of orders per customer.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+        approximate (Optional[bool]): Whether to approximate distinct counts
+            (default is APPROXIMATE_DISTINCT_COUNTS).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [avg_orders_per_customer].
     """
-    query = """
-    SELECT COUNT(DISTINCT order_id) * 1.0 / COUNT(DISTINCT customer_sk) AS avg_orders_per_customer
-    FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis(
+        "avg_orders_per_customer", filters=filters, approximate=approximate
+    )
 
 
-def get_top_customers(limit: int = 10) -> Optional[pd.DataFrame]:
+def get_top_customers(
+    limit: int = 10, filters: Filters = None
+) -> Optional[pd.DataFrame]:
     """
-    Retrieves the top customers based on total sales.
+    Retrieves the top customers based on total sales, from the agg_sales_by_customer
+    rollup, or from fact_order_items when filters are set.
 
     Args:
         limit (int): Number of top customers to return (default is 10).
+        filters (Filters): Dashboard filters to apply (default is None).
 
     Returns:
         Optional[pd.DataFrame]: DataFrame with columns [customer_name, total_sales].
     """
-    query = """
+    if not has_filters(filters):
+        query = """
+        SELECT
+            customer_name,
+            SUM(total_sales) AS total_sales
+        FROM main_analytics.agg_sales_by_customer
+        GROUP BY customer_name
+        ORDER BY total_sales DESC
+        LIMIT ?
+        """
+        return execute_query(query, (limit,), name="get_top_customers")
+
+    where, params = build_filter_clause(filters, "foi", grain="item")
+    query = f"""
     SELECT 
         c.customer_name,
         SUM(foi.adjusted_sales) AS total_sales
     FROM main_analytics.fact_order_items foi
     JOIN main_analytics.dim_customers c ON foi.customer_sk = c.customer_sk
+    {where}
     GROUP BY c.customer_name
     ORDER BY total_sales DESC
     LIMIT ?
     """
-    return execute_query(query, (limit,))
+    return execute_query(query, params + (limit,), name="get_top_customers")
 
 
-def get_top_managers(limit: int = 10) -> Optional[pd.DataFrame]:
+def get_top_managers(
+    limit: int = 10, filters: Filters = None
+) -> Optional[pd.DataFrame]:
     """
-    Retrieves the top managers based on total sales performance.
+    Retrieves the top managers based on total sales performance, from the
+    agg_sales_by_manager rollup, or from fact_orders when filters are set.
 
     Args:
         limit (int): Number of top managers to return (default is 10).
+        filters (Filters): Dashboard filters to apply (default is None).
 
     Returns:
         Optional[pd.DataFrame]: DataFrame with columns [manager, total_sales].
     """
-    query = """
+    if not has_filters(filters):
+        query = """
+        SELECT manager, total_sales
+        FROM main_analytics.agg_sales_by_manager
+        ORDER BY total_sales DESC
+        LIMIT ?
+        """
+        return execute_query(query, (limit,), name="get_top_managers")
+
+    where, params = build_filter_clause(filters, "fo")
+    query = f"""
     SELECT 
         m.manager,
         SUM(fo.adjusted_sales) AS total_sales
     FROM main_analytics.fact_orders fo
     JOIN main_analytics.dim_managers m ON fo.manager_id = m.manager_id
+    {where}
     GROUP BY m.manager
     ORDER BY total_sales DESC
     LIMIT ?
     """
-    return execute_query(query, (limit,))
+    return execute_query(query, params + (limit,), name="get_top_managers")
 
 
-def get_avg_delivery_time() -> Optional[pd.DataFrame]:
+def get_avg_delivery_time(filters: Filters = None) -> Optional[pd.DataFrame]:
     """
     Calculates the average delivery time.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [avg_delivery_time].
     """
-    query = """
-    SELECT AVG(avg_delivery_time) AS avg_delivery_time FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis("avg_delivery_time", filters=filters)
 
 
-def get_contribution_margin() -> Optional[pd.DataFrame]:
+def get_contribution_margin(filters: Filters = None) -> Optional[pd.DataFrame]:
     """
     Calculates the contribution margin.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [contribution_margin].
     """
-    query = """
-    SELECT SUM(adjusted_profit) * 100.0 / SUM(adjusted_sales) AS contribution_margin FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis("contribution_margin", filters=filters)
 
 
-def get_net_revenue() -> Optional[pd.DataFrame]:
+def get_net_revenue(filters: Filters = None) -> Optional[pd.DataFrame]:
     """
     Retrieves the total net revenue, which is the sum of adjusted sales.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [net_revenue].
     """
-    query = """
-    SELECT 
-        COALESCE(SUM(adjusted_sales), 0) AS net_revenue
-    FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis("net_revenue", filters=filters)
 
 
-def get_effective_profit_margin() -> Optional[pd.DataFrame]:
+def get_effective_profit_margin(filters: Filters = None) -> Optional[pd.DataFrame]:
     """
     Calculates the effective profit margin as a percentage of adjusted sales.
 
+    Args:
+        filters (Filters): Dashboard filters to apply (default is None).
+
     Returns:
         Optional[pd.DataFrame]: DataFrame with a single column [effective_profit_margin].
     """
-    query = """
-    SELECT 
-        CASE 
-            WHEN SUM(adjusted_sales) > 0 
-            THEN (SUM(adjusted_profit) * 100.0) / SUM(adjusted_sales) 
-            ELSE 0 
-        END AS effective_profit_margin
-    FROM main_analytics.fact_orders;
-    """
-    return execute_query(query)
+    return _select_kpis("effective_profit_margin", filters=filters)
+
+
+# Sources of the server-side paginated drill-down tables. Each query has a {where}
+# placeholder for the dashboard filters, applied to the fact table alias at the given
+# grain. A source with a rollup_query reads it instead while no dashboard filter is
+# set. Only the listed columns can be displayed, sorted and filtered; their types
+# decide how a table filter is parsed. Rows are always ordered by the key columns
+# last, so pages stay stable when the sorted column has ties; the key must be unique
+# per row and selected by both queries, but need not be listed.
+TABLE_SOURCES: Dict[str, Dict[str, Any]] = {
+    "customer_returns": {
+        "query": """
+        SELECT
+            c.customer_name,
+            c.segment,
+            COUNT(DISTINCT f.order_id) AS total_orders,
+            COUNT(DISTINCT CASE WHEN f.is_return_order THEN f.order_id END) AS returned_orders,
+            ROUND(
+                COUNT(DISTINCT CASE WHEN f.is_return_order THEN f.order_id END) * 100.0
+                / COUNT(DISTINCT f.order_id), 2
+            ) AS return_rate,
+            c.customer_sk
+        FROM main_analytics.fact_orders f
+        JOIN main_analytics.dim_customers c ON f.customer_sk = c.customer_sk
+        {where}
+        GROUP BY c.customer_sk, c.customer_name, c.segment
+        """,
+        "rollup_query": """
+        SELECT
+            customer_name,
+            segment,
+            total_orders,
+            returned_orders,
+            return_rate,
+            customer_sk
+        FROM main_analytics.mart_customer_returns
+        """,
+        "alias": "f",
+        "grain": "order",
+        "columns": {
+            "customer_name": "text",
+            "segment": "text",
+            "total_orders": "numeric",
+            "returned_orders": "numeric",
+            "return_rate": "numeric",
+        },
+        "default_sort": [("return_rate", "desc"), ("total_orders", "desc")],
+        "key": ["customer_sk"],
+    },
+    "orders": {
+        "query": """
+        SELECT
+            f.order_id,
+            f.order_date,
+            f.ship_date,
+            f.ship_mode,
+            c.customer_name,
+            l.region,
+            l.city,
+            f.sales,
+            CAST(f.quantity AS BIGINT) AS quantity,
+            f.profit,
+            CASE WHEN f.is_return_order THEN 'Yes' ELSE 'No' END AS returned,
+            f.order_key,
+            f.manager_id,
+            f.location_id,
+            f.customer_sk
+        FROM main_analytics.fact_orders f
+        LEFT JOIN main_analytics.dim_customers c ON f.customer_sk = c.customer_sk
+        LEFT JOIN main_analytics.dim_location l ON f.location_id = l.location_id
+        {where}
+        """,
+        "alias": "f",
+        "grain": "order",
+        "columns": {
+            "order_id": "text",
+            "order_date": "datetime",
+            "ship_date": "datetime",
+            "ship_mode": "text",
+            "customer_name": "text",
+            "region": "text",
+            "city": "text",
+            "sales": "numeric",
+            "quantity": "numeric",
+            "profit": "numeric",
+            "returned": "text",
+        },
+        "default_sort": [("order_date", "desc")],
+        # The grain of fact_orders: an order_id can repeat across shipments,
+        # customers, locations and managers.
+        "key": [
+            "order_id",
+            "order_key",
+            "order_date",
+            "ship_date",
+            "ship_mode",
+            "manager_id",
+            "location_id",
+            "customer_sk",
+        ],
+    },
+    "order_items": {
+        "query": """
+        SELECT
+            foi.order_line_id,
+            foi.order_id,
+            foi.order_date,
+            p.product_name,
+            p.category,
+            p.sub_category,
+            c.customer_name,
+            foi.sales,
+            foi.quantity,
+            foi.profit
+        FROM main_analytics.fact_order_items foi
+        LEFT JOIN main_analytics.dim_products p ON foi.product_sk = p.product_sk
+        LEFT JOIN main_analytics.dim_customers c ON foi.customer_sk = c.customer_sk
+        {where}
+        """,
+        "alias": "foi",
+        "grain": "item",
+        "columns": {
+            "order_line_id": "numeric",
+            "order_id": "text",
+            "order_date": "datetime",
+            "product_name": "text",
+            "category": "text",
+            "sub_category": "text",
+            "customer_name": "text",
+            "sales": "numeric",
+            "quantity": "numeric",
+            "profit": "numeric",
+        },
+        "default_sort": [("order_date", "desc")],
+        "key": ["order_line_id"],
+    },
+}
+
+# One condition of a DataTable filter_query, e.g. {sales} >= 100 or
+# {customer_name} icontains "smith". Operators may carry an "i" (case-insensitive)
+# or "s" (case-sensitive) prefix.
+_TABLE_FILTER_PATTERN = re.compile(
+    r"""^\{(?P<column>[^}]+)\}\s*
+    (?P<case>[is]?)(?P<operator>contains|datestartswith|eq|ne|lt|le|gt|ge|<=|>=|!=|<|>|=)
+    \s*(?P<value>.*)$""",
+    re.VERBOSE,
+)
+
+_TABLE_FILTER_OPERATORS = {
+    "eq": "=",
+    "ne": "!=",
+    "lt": "<",
+    "le": "<=",
+    "gt": ">",
+    "ge": ">=",
+}
+
+
+def _parse_filter_value(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'`":
+        quote = value[0]
+        value = value[1:-1].replace(f"\\{quote}", quote)
+    return value
+
+
+def build_table_filter_clause(
+    filter_query: Optional[str], columns: Dict[str, str]
+) -> Tuple[str, tuple]:
+    """
+    Translates a DataTable filter_query into an SQL WHERE clause over whitelisted
+    columns.
+
+    Args:
+        filter_query (str): The filter_query of the DataTable, conditions joined by &&.
+        columns (Dict[str, str]): Filterable columns and their DataTable type.
+
+    Returns:
+        Tuple[str, tuple]: The WHERE clause (empty if nothing is filtered) and its parameters.
+
+    Raises:
+        ValueError: If the filter uses an unknown column, operator or a bad value.
+    """
+    conditions: List[str] = []
+    params: List[Any] = []
+
+    for part in (filter_query or "").split(" && "):
+        part = part.strip()
+        if not part:
+            continue
+        match = _TABLE_FILTER_PATTERN.match(part)
+        if match is None:
+            raise ValueError(f"Unsupported table filter: {part}")
+        column = match["column"]
+        if column not in columns:
+            raise ValueError(f"Unknown table column: {column}")
+
+        operator = _TABLE_FILTER_OPERATORS.get(match["operator"], match["operator"])
+        value = _parse_filter_value(match["value"])
+        expression = f'"{column}"'
+        column_type = columns[column]
+
+        if operator == "datestartswith":
+            conditions.append(f"starts_with(CAST({expression} AS VARCHAR), ?)")
+            params.append(value)
+            continue
+        if column_type == "numeric":
+            try:
+                params.append(float(value))
+            except ValueError:
+                raise ValueError(f"Not a number for {column}: {value}") from None
+            if operator == "contains":
+                operator = "="
+            conditions.append(f"{expression} {operator} ?")
+            continue
+
+        if match["case"] == "i":
+            expression, value = f"lower({expression})", value.lower()
+        if operator == "contains":
+            conditions.append(f"contains({expression}, ?)")
+        else:
+            conditions.append(f"{expression} {operator} ?")
+        params.append(value)
+
+    if not conditions:
+        return "", ()
+    return "WHERE " + "\n      AND ".join(conditions), tuple(params)
+
+
+def build_table_order_clause(
+    sort_by: Optional[List[Dict[str, str]]], source: Dict[str, Any]
+) -> str:
+    """
+    Translates a DataTable sort_by into an SQL ORDER BY clause over whitelisted
+    columns, falling back to the default sort of the source.
+
+    Raises:
+        ValueError: If the sort uses an unknown column or direction.
+    """
+    terms = [(item["column_id"], item["direction"]) for item in sort_by or []]
+    terms = terms or source["default_sort"]
+    order_by = []
+    for column, direction in terms:
+        if column not in source["columns"] or direction not in ("asc", "desc"):
+            raise ValueError(f"Unsupported table sort: {column} {direction}")
+        order_by.append(f'"{column}" {direction.upper()}')
+    order_by.extend(f'"{column}" ASC' for column in source["key"])
+    return "ORDER BY " + ", ".join(order_by)
+
+
+def get_table_page(
+    table: str,
+    page_current: int = 0,
+    page_size: int = 10,
+    sort_by: Optional[List[Dict[str, str]]] = None,
+    filter_query: Optional[str] = None,
+    filters: Filters = None,
+) -> Tuple[Optional[pa.Table], int]:
+    """
+    Retrieves one page of a drill-down table, sorted and filtered in DuckDB, so only
+    the rows on screen are sent to the browser whatever the size of the table.
+
+    Args:
+        table (str): Name of the source in TABLE_SOURCES.
+        page_current (int): Zero-based page number (default is 0).
+        page_size (int): Number of rows per page (default is 10).
+        sort_by (List[Dict[str, str]], optional): The sort_by of the DataTable.
+        filter_query (str, optional): The filter_query of the DataTable.
+        filters (Filters): Dashboard filters to apply (default is None).
+
+    Returns:
+        Tuple[Optional[pa.Table], int]: The rows of the page, or None if there are
+        none, and the number of pages.
+    """
+    source = TABLE_SOURCES[table]
+    try:
+        table_where, table_params = build_table_filter_clause(
+            filter_query, source["columns"]
+        )
+        order_by = build_table_order_clause(sort_by, source)
+    except ValueError as e:
+        logging.warning(f"Ignoring table request for {table}: {e}")
+        return None, 0
+
+    if "rollup_query" in source and not has_filters(filters):
+        source_query, params = source["rollup_query"], ()
+    else:
+        where, params = build_filter_clause(filters, source["alias"], source["grain"])
+        source_query = source["query"].format(where=where)
+    params = params + table_params
+
+    count = execute_query(
+        f"""
+        SELECT COUNT(*) AS row_count
+        FROM ({source_query}) AS q
+        {table_where}
+        """,
+        params,
+        name=f"{table}_count",
+    )
+    row_count = int(count.iloc[0, 0]) if count is not None else 0
+    page_count = max(math.ceil(row_count / page_size), 1)
+
+    projection = ", ".join(f'"{column}"' for column in source["columns"])
+    query = f"""
+    SELECT {projection}
+    FROM ({source_query}) AS q
+    {table_where}
+    {order_by}
+    LIMIT ? OFFSET ?
+    """
+    page = execute_query(
+        query,
+        params + (page_size, page_current * page_size),
+        output="arrow",
+        name=f"{table}_page",
+    )
+    return (plain_arrow_types(page) if page is not None else None), page_count
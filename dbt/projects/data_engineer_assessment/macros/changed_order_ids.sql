@@ -0,0 +1,22 @@
+{#
+    Selects the order_ids an incremental fact model has to (re)build: orders with
+    source lines above the highest line id already in the model, and orders within
+    the late-arriving returns window whose return status no longer matches
+    stg_returns. Run `dbt run --full-refresh` to rebuild the whole history instead.
+#}
+{% macro changed_order_ids(line_id_column) %}
+    select o.order_id
+    from {{ ref('stg_orders') }} o
+    where o.id > (select coalesce(max({{ line_id_column }}), -1) from {{ this }})
+
+    union
+
+    select t.order_id
+    from {{ this }} t
+    left join {{ ref('stg_returns') }} r
+        on r.order_key = t.order_key
+    where t.order_date >= (
+            select max(order_date) from {{ this }}
+        ) - interval '{{ var("returns_lookback_days") }} days'
+        and t.is_return_order != (r.returned is not null)
+{% endmacro %}
@@ -0,0 +1,64 @@
+{#
+    ENUM types for the low-cardinality text columns of the staging layer. DuckDB
+    stores an ENUM value as a one-byte index into the type's values, so these columns
+    take a fraction of the space of VARCHAR, and comparisons, group-bys and joins on
+    them work on integers.
+#}
+{% macro enum_type(column) -%}
+    {{ column }}_enum
+{%- endmacro %}
+
+{#
+    Pre-hook that (re)creates the <column>_enum type of each column from the distinct
+    trimmed values in the source relation. Values are only ever added, so rows
+    already stored by incremental models remain valid, and they are kept sorted so
+    that ORDER BY on an enum column matches the text order.
+#}
+{% macro create_enum_types(relation, columns) %}
+    {%- for column in columns %}
+        {%- set existing = execute and run_query(
+            "select count(*) from duckdb_types() where type_name = '" ~ enum_type(column) ~ "'"
+        ).rows[0][0] > 0 %}
+    create or replace type {{ enum_type(column) }} as enum (
+        select value
+        from (
+            select trim({{ column }}) as value from {{ relation }}
+            {%- if existing %}
+            union
+            select unnest(enum_range(null::{{ enum_type(column) }}))
+            {%- endif %}
+        )
+        where value is not null
+        group by value
+        order by value
+    );
+    {%- endfor %}
+{% endmacro %}
+
+{#
+    Pre-hook for incremental models with enum columns. When a column's type has
+    gained values since the table was built, the column is converted to the current
+    type so that the new rows can be inserted. Tables built before the column became
+    an enum are left alone until the next --full-refresh.
+#}
+{% macro sync_enum_columns(columns) %}
+    {%- if execute and not flags.FULL_REFRESH and load_relation(this) is not none %}
+        {%- for column in columns %}
+            {%- set column_type = run_query(
+                "select data_type from information_schema.columns"
+                ~ " where table_schema = '" ~ this.schema ~ "'"
+                ~ " and table_name = '" ~ this.identifier ~ "'"
+                ~ " and column_name = '" ~ column ~ "'"
+            ) %}
+            {%- if column_type.rows and column_type.rows[0][0].startswith('ENUM') %}
+                {%- set stale = run_query(
+                    "select enum_range(" ~ column ~ ") != enum_range(null::" ~ enum_type(column) ~ ")"
+                    ~ " from " ~ this ~ " limit 1"
+                ) %}
+                {%- if stale.rows and stale.rows[0][0] %}
+    alter table {{ this }} alter column {{ column }} type {{ enum_type(column) }};
+                {%- endif %}
+            {%- endif %}
+        {%- endfor %}
+    {%- endif %}
+{% endmacro %}
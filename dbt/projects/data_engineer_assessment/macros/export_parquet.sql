@@ -0,0 +1,37 @@
+{#
+    Post-hook that exports the model to Parquet under the parquet_export_path var,
+    so Spark and DuckDB readers can scan it without taking the warehouse file lock.
+
+    With partition_by_date, rows are written to Hive-style order_year=/order_month=
+    directories derived from that date column; otherwise to a single
+    <model>.parquet file. Rows are written in order_by order, so the min/max
+    statistics of each row group cover narrow ranges of those columns.
+
+    Every export replaces the previous one. A partitioned export clears the model's
+    directory first, so months that are no longer in the model are not left behind;
+    readers scanning the directory while it is rewritten can see it incomplete.
+#}
+{% macro export_parquet(order_by=none, partition_by_date=none) %}
+    {%- if var('parquet_export_enabled') -%}
+    copy (
+        select
+              *
+            {%- if partition_by_date %}
+            , year({{ partition_by_date }}) as order_year
+            , month({{ partition_by_date }}) as order_month
+            {%- endif %}
+        from {{ this }}
+        {%- if order_by %}
+        order by {{ order_by }}
+        {%- endif %}
+    ) to '{{ var("parquet_export_path") }}/{{ this.identifier }}{{ "" if partition_by_date else ".parquet" }}' (
+        format parquet
+        , compression zstd
+        , row_group_size {{ var('parquet_row_group_size') }}
+        {%- if partition_by_date %}
+        , partition_by (order_year, order_month)
+        , overwrite
+        {%- endif %}
+    )
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,22 @@
+{#
+    HyperLogLog register of a column value. hll_bucket() picks one of
+    2^hll_precision registers from the low bits of hash(column), hll_rho() is the
+    position of the lowest set bit of the remaining bits. A sketch keeps the highest
+    rho per bucket; merging sketches takes the highest per bucket again, so sketches
+    of any set of rows can be combined into a distinct count estimate.
+#}
+{% macro hll_bucket(column) -%}
+    cast((hash({{ column }}) & {{ (2 ** var('hll_precision')) - 1 }}) as usmallint)
+{%- endmacro %}
+
+{% macro hll_rho(column) -%}
+    cast(
+        case when (hash({{ column }}) >> {{ var('hll_precision') }}) = 0
+            then {{ 65 - var('hll_precision') }}
+            else bit_count(xor(
+                (hash({{ column }}) >> {{ var('hll_precision') }}),
+                (hash({{ column }}) >> {{ var('hll_precision') }}) - 1
+            ))
+        end
+    as utinyint)
+{%- endmacro %}
@@ -0,0 +1,10 @@
+{#
+    Normalizes one or more columns into a single integer join key with the same
+    hash() used for the surrogate keys. The key is NULL when any column is NULL, so
+    those rows still fail to join, as they would with plain equality predicates.
+#}
+{% macro join_key(columns) -%}
+    case when {% for column in columns %}{{ column }} is not null{% if not loop.last %} and {% endif %}{% endfor %}
+        then hash({% for column in columns %}lower(cast({{ column }} as varchar)){% if not loop.last %}, {% endif %}{% endfor %})
+    end
+{%- endmacro %}
@@ -0,0 +1,17 @@
+{#
+    Rewrites the fact tables in fact_sort_order order. Incremental runs append every
+    batch sorted, but rebuilt orders land at the end of the table and widen the
+    min/max ranges of its last row groups; run `dbt run-operation recluster` when
+    benchmarks/row_group_stats.py shows filters scanning more row groups than they
+    should.
+#}
+{% macro recluster(models=['fact_orders', 'fact_order_items']) %}
+    {% for model in models %}
+        {% set relation = ref(model) %}
+        {% do log("Reclustering " ~ relation ~ " by " ~ var('fact_sort_order'), info=true) %}
+        {% do run_query(
+            "create or replace table " ~ relation ~ " as select * from " ~ relation
+            ~ " order by " ~ var('fact_sort_order')
+        ) %}
+    {% endfor %}
+{% endmacro %}
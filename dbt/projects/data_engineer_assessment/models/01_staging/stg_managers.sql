@@ -3,5 +3,6 @@ with raw_managers as (
 )
 select
     trim(manager) as manager,
-    trim(region) as region
+    trim(region) as region,
+    {{ join_key(['trim(region)']) }} as region_key
 from raw_managers
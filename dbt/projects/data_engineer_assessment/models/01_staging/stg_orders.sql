@@ -1,27 +1,44 @@
+{{
+    config(
+        pre_hook="{{ create_enum_types('orders', ['ship_mode', 'segment', 'country', 'region', 'category', 'sub_category']) }}"
+    )
+}}
+
 with raw_orders as (
     select * from orders
-)
+),
 
-select
+trimmed_orders as (
+    select
       id
     , order_id
     , order_date
     , ship_date
-    , trim(ship_mode) as ship_mode
+    , cast(trim(ship_mode) as {{ enum_type('ship_mode') }}) as ship_mode
     , trim(customer_id) as customer_id
     , trim(customer_name) as customer_name
-    , trim(segment) as segment
-    , trim(country) as country
+    , cast(trim(segment) as {{ enum_type('segment') }}) as segment
+    , cast(trim(country) as {{ enum_type('country') }}) as country
     , trim(city) as city
     , trim(state) as state
     , postal_code
-    , trim(region) as region
+    , cast(trim(region) as {{ enum_type('region') }}) as region
     , trim(product_id) as product_id
-    , trim(category) as category
-    , trim(sub_category) as sub_category
+    , cast(trim(category) as {{ enum_type('category') }}) as category
+    , cast(trim(sub_category) as {{ enum_type('sub_category') }}) as sub_category
     , trim(product_name) as product_name
-    , sales
-    , quantity
-    , discount
-    , profit
-from raw_orders
\ No newline at end of file
+    , cast(sales as decimal(18, 4)) as sales
+    , cast(quantity as smallint) as quantity
+    , cast(discount as decimal(4, 2)) as discount
+    , cast(profit as decimal(18, 4)) as profit
+    from raw_orders
+)
+
+select
+      *
+    , {{ join_key(['trim(order_id)']) }} as order_key
+    , {{ join_key(['customer_id']) }} as customer_key
+    , {{ join_key(['product_id']) }} as product_key
+    , {{ join_key(['region']) }} as region_key
+    , {{ join_key(['country', 'city', 'state', 'postal_code', 'region']) }} as location_key
+from trimmed_orders
\ No newline at end of file
@@ -4,6 +4,7 @@ with raw_returns as (
 
 select
     trim(order_id) as order_id,
-    lower(trim(returned)) as returned
+    lower(trim(returned)) as returned,
+    {{ join_key(['trim(order_id)']) }} as order_key
 from raw_returns
-group by 1,2
\ No newline at end of file
+group by 1,2,3
\ No newline at end of file
@@ -3,8 +3,9 @@ with distinct_customers as (
           customer_id
         , customer_name
         , segment
+        , customer_key
     from {{ ref('stg_orders') }}
-    group by 1, 2, 3
+    group by 1, 2, 3, 4
 )
 
 select
@@ -18,4 +19,5 @@ select
     , customer_id
     , customer_name
     , segment
+    , customer_key
 from distinct_customers
\ No newline at end of file
@@ -6,8 +6,9 @@ unique_locations as (
         , state
         , postal_code
         , region
+        , location_key
     from {{ ref('stg_orders') }}
-    group by 1,2,3,4,5
+    group by 1,2,3,4,5,6
 )
 select
       hash(concat(country, city, state, postal_code, region)) as location_id
@@ -16,4 +17,5 @@ select
     , state
     , postal_code
     , region
+    , location_key
 from unique_locations
\ No newline at end of file
@@ -3,9 +3,10 @@ raw_managers_orders as (
   select 
     'unknow' as manager
    , region 
+   , region_key
   from 
     {{ ref('stg_orders') }}
-  group by 1,2 
+  group by 1,2,3 
 ),
 raw_dim_managers as (
     select * from {{ ref('stg_managers') }}
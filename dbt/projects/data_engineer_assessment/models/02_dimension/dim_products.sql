@@ -4,12 +4,13 @@ with distinct_products as (
       , category
       , sub_category
       , product_name
+      , product_key
       , row_number() over (
           partition by product_id 
           order by count(*) desc, product_name desc
       ) as rn
     from {{ ref('stg_orders') }}
-    group by 1,2,3,4
+    group by 1,2,3,4,5
 )
 
 select
@@ -25,5 +26,6 @@ select
   , category
   , sub_category
   , product_name
+  , product_key
 from distinct_products
 where rn = 1
\ No newline at end of file
@@ -1,7 +1,23 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='order_id',
+        incremental_strategy='delete+insert',
+        pre_hook="{{ sync_enum_columns(['ship_mode']) }}"
+    )
+}}
+
 with 
+{% if is_incremental() %}
+changed_orders as (
+    {{ changed_order_ids('order_line_id') }}
+),
+{% endif %}
 enriched_order_items as (
     select
-          o.order_id
+          o.id as order_line_id
+        , o.order_id
+        , o.order_key
         , o.product_id
         , m.manager_id
         , l.location_id
@@ -16,24 +32,26 @@ enriched_order_items as (
     from {{ ref('stg_orders') }} o
 
     left join {{ ref('dim_managers') }} m
-        on lower(trim(o.region)) = lower(trim(m.region))
+        on o.region_key = m.region_key
         
     left join {{ ref('dim_location') }} l
-        on lower(trim(o.country)) = lower(trim(l.country))
-        and lower(trim(o.city)) = lower(trim(l.city))
-        and lower(trim(o.state)) = lower(trim(l.state))
-        and o.postal_code = l.postal_code
-        and lower(trim(o.region)) = lower(trim(l.region))
+        on o.location_key = l.location_key
 
     left join {{ ref('dim_customers') }} c
-        on lower(trim(o.customer_id)) = lower(trim(c.customer_id))
+        on o.customer_key = c.customer_key
 
     left join {{ ref('dim_products') }} p
-        on lower(trim(o.product_id)) = lower(trim(p.product_id))
+        on o.product_key = p.product_key
+
+    {% if is_incremental() %}
+    where o.order_id in (select order_id from changed_orders)
+    {% endif %}
 ),
 raw_fact as (
     select
-          o.order_id
+          o.order_line_id
+        , o.order_id
+        , o.order_key
         , o.product_sk
         , o.order_date
         , o.ship_date
@@ -63,7 +81,7 @@ enriched_fact as (
           end as adjusted_profit 
     from raw_fact rf
     left join {{ ref('stg_returns') }} r
-        on lower(trim(r.order_id)) = lower(trim(rf.order_id))
+        on r.order_key = rf.order_key
 )
 select
       ef.*
@@ -72,3 +90,4 @@ select
         else 0 
       end as profit_margin
 from enriched_fact ef
+order by {{ var('fact_sort_order') }}
@@ -1,4 +1,18 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='order_id',
+        incremental_strategy='delete+insert',
+        pre_hook="{{ sync_enum_columns(['ship_mode']) }}"
+    )
+}}
+
 with 
+{% if is_incremental() %}
+changed_orders as (
+    {{ changed_order_ids('last_order_line_id') }}
+),
+{% endif %}
 enriched_orders as (
     select
           o.*
@@ -8,33 +22,35 @@ enriched_orders as (
     from {{ ref('stg_orders') }} o
     
     left join {{ ref('dim_managers') }} m
-        on lower(trim(o.region)) = lower(trim(m.region))
+        on o.region_key = m.region_key
         
     left join {{ ref('dim_location') }} l
-        on lower(trim(o.country)) = lower(trim(l.country))
-        and lower(trim(o.city)) = lower(trim(l.city))
-        and lower(trim(o.state)) = lower(trim(l.state))
-        and o.postal_code = l.postal_code
-        and lower(trim(o.region)) = lower(trim(l.region))
+        on o.location_key = l.location_key
         
     left join {{ ref('dim_customers') }} c
-        on lower(trim(o.customer_id)) = lower(trim(c.customer_id))
+        on o.customer_key = c.customer_key
+
+    {% if is_incremental() %}
+    where o.order_id in (select order_id from changed_orders)
+    {% endif %}
 ),
 raw_fact as (
     select
           o.order_id
+        , o.order_key
         , o.order_date
         , o.ship_date
         , o.ship_mode
         , o.manager_id  -- Foreign key to dim_managers
         , o.location_id -- Foreign key to dim_location
         , o.customer_sk -- Foreign key to dim_customers
-        , sum(o.sales) as sales
-        , sum(o.quantity) as quantity
-        , sum(o.profit) as profit
+        , cast(sum(o.sales) as decimal(18, 4)) as sales
+        , cast(sum(o.quantity) as integer) as quantity
+        , cast(sum(o.profit) as decimal(18, 4)) as profit
         , avg(datediff('day', o.order_date, o.ship_date)) as avg_delivery_time
+        , max(o.id) as last_order_line_id
     from enriched_orders o
-    group by 1,2,3,4,5,6,7
+    group by 1,2,3,4,5,6,7,8
 ),
 enriched_fact as (
     select 
@@ -53,7 +69,7 @@ enriched_fact as (
           end as adjusted_profit
     from raw_fact rf
     left join {{ ref('stg_returns') }} r
-        on lower(trim(r.order_id)) = lower(trim(rf.order_id))
+        on r.order_key = rf.order_key
 )
 select
       ef.*
@@ -61,4 +77,5 @@ select
         then adjusted_profit / adjusted_sales 
         else 0 
       end as profit_margin
-from enriched_fact ef
\ No newline at end of file
+from enriched_fact ef
+order by {{ var('fact_sort_order') }}
\ No newline at end of file
@@ -0,0 +1,62 @@
+{% set sketches = {'customer_sketch': 'customer_sk', 'order_sketch': 'order_id'} %}
+
+with orders as (
+    select
+          fo.*
+        , l.region
+        , c.segment
+    from {{ ref('fact_orders') }} fo
+    left join (select distinct location_id, region from {{ ref('dim_location') }}) l
+        on fo.location_id = l.location_id
+    left join (select distinct customer_sk, segment from {{ ref('dim_customers') }}) c
+        on fo.customer_sk = c.customer_sk
+),
+{% for sketch, column in sketches.items() %}
+{{ sketch }}_registers as (
+    select
+          order_date
+        , region
+        , segment
+        , {{ hll_bucket(column) }} as bucket
+        , max({{ hll_rho(column) }}) as rho
+    from orders
+    where {{ column }} is not null
+    group by 1, 2, 3, 4
+),
+{{ sketch }}es as (
+    select
+          order_date
+        , region
+        , segment
+        , list({'bucket': bucket, 'rho': rho}) as {{ sketch }}
+    from {{ sketch }}_registers
+    group by 1, 2, 3
+),
+{% endfor %}
+totals as (
+    select
+          order_date
+        , region
+        , segment
+        , count(*) as order_rows
+        , sum(case when is_return_order then 1 else 0 end) as returned_orders
+        , cast(sum(adjusted_sales) as decimal(18, 4)) as total_sales
+        , cast(sum(adjusted_profit) as decimal(18, 4)) as total_profit
+        , sum(avg_delivery_time) as delivery_time_sum
+        , count(avg_delivery_time) as delivery_time_count
+    from orders
+    group by 1, 2, 3
+)
+select
+      t.*
+{% for sketch in sketches %}
+    , {{ sketch }}es.{{ sketch }}
+{% endfor %}
+from totals t
+{% for sketch in sketches %}
+left join {{ sketch }}es
+    on t.order_date is not distinct from {{ sketch }}es.order_date
+    and t.region is not distinct from {{ sketch }}es.region
+    and t.segment is not distinct from {{ sketch }}es.segment
+{% endfor %}
+order by 1
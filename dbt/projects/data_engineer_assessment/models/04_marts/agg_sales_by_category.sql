@@ -0,0 +1,9 @@
+select
+      p.category
+    , cast(sum(foi.adjusted_sales) as decimal(18, 4)) as total_sales
+    , cast(sum(foi.adjusted_profit) as decimal(18, 4)) as total_profit
+from {{ ref('fact_order_items') }} foi
+join {{ ref('dim_products') }} p
+    on foi.product_sk = p.product_sk
+group by 1
+order by 2 desc
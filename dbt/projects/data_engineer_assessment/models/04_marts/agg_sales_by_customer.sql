@@ -0,0 +1,10 @@
+select
+      c.customer_sk
+    , c.customer_name
+    , cast(sum(foi.adjusted_sales) as decimal(18, 4)) as total_sales
+    , cast(sum(foi.adjusted_profit) as decimal(18, 4)) as total_profit
+from {{ ref('fact_order_items') }} foi
+join {{ ref('dim_customers') }} c
+    on foi.customer_sk = c.customer_sk
+group by 1, 2
+order by 3 desc
@@ -0,0 +1,9 @@
+select
+      m.manager
+    , cast(sum(fo.adjusted_sales) as decimal(18, 4)) as total_sales
+    , cast(sum(fo.adjusted_profit) as decimal(18, 4)) as total_profit
+from {{ ref('fact_orders') }} fo
+join {{ ref('dim_managers') }} m
+    on fo.manager_id = m.manager_id
+group by 1
+order by 2 desc
@@ -0,0 +1,8 @@
+select
+      strftime('%Y-%m', order_date) as month
+    , cast(sum(adjusted_sales) as decimal(18, 4)) as total_sales
+    , cast(sum(adjusted_profit) as decimal(18, 4)) as total_profit
+    , count(*) as order_count
+from {{ ref('fact_orders') }}
+group by 1
+order by 1
@@ -0,0 +1,33 @@
+with customer_orders as (
+    select
+          customer_sk
+        , count(distinct order_id) as total_orders
+        , count(distinct case when is_return_order then order_id end) as returned_orders
+        , cast(sum(adjusted_sales) as decimal(18, 4)) as total_sales
+        , cast(sum(adjusted_profit) as decimal(18, 4)) as total_profit
+    from {{ ref('fact_orders') }}
+    where customer_sk is not null
+    group by 1
+),
+customers as (
+    select
+          customer_sk
+        , min(customer_name) as customer_name
+        , min(segment) as segment
+    from {{ ref('dim_customers') }}
+    group by 1
+)
+select
+      co.customer_sk
+    , c.customer_name
+    , c.segment
+    , co.total_orders
+    , co.returned_orders
+    , round(co.returned_orders * 100.0 / co.total_orders, 2) as return_rate
+    , co.total_sales
+    , co.total_profit
+from customer_orders co
+join customers c
+    on co.customer_sk = c.customer_sk
+-- Stored by return rate, so top-N reads stop at the first row groups.
+order by return_rate desc, total_orders desc
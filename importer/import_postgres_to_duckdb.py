@@ -1,11 +1,97 @@
+import argparse
+import datetime
 import duckdb
 import logging
-from typing import Dict, List
+import os
+import psycopg2
+import psycopg2.extras
+import pyarrow as pa
+import pyarrow.csv
+import select
+import struct
+import sys
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "import_config.toml"
+)
+STATE_TABLE = "_import_state"
+PARTS_SCHEMA = "_import_parts"
+SHADOW_SUFFIX = "__shadow"
+DELTA_SUFFIX = "__delta"
+EXTRACT_METHODS = ("scan", "copy")
+LOAD_STRATEGIES = ("full", "incremental")
+COPY_BATCH_BYTES = 16 * 1024 * 1024
+TABLE_SETTINGS = {
+    "strategy",
+    "cursor_column",
+    "key_column",
+    "partition_column",
+    "parallelism",
+    "extract_method",
+    "batch_bytes",
+    "columns",
+    "sort_by",
+}
+CDC_STATE_TABLE = "_cdc_state"
+# Defaults of the [cdc] section of the import spec, used by --cdc.
+CDC_DEFAULTS = {
+    "slot_name": "duckdb_importer",
+    "publication": "duckdb_importer",
+    "batch_seconds": 60,
+    "batch_changes": 50_000,
+}
+# How long the CDC stream waits for a message before checking whether its batch is due.
+CDC_POLL_SECONDS = 1.0
+# DuckDB settings an execution profile of the import spec ([profiles.<name>]) can set.
+PROFILE_SETTINGS = {
+    "memory_limit",
+    "threads",
+    "temp_directory",
+    "max_temp_directory_size",
+    "preserve_insertion_order",
+}
+# Environment variables that take precedence over the [postgres] section of the
+# import spec, so that credentials need not be stored in it.
+POSTGRES_ENV_OVERRIDES = {
+    "host": "POSTGRES_HOST",
+    "port": "POSTGRES_PORT",
+    "database": "POSTGRES_DB",
+    "user": "POSTGRES_USER",
+    "password": "POSTGRES_PASSWORD",
+}
+
+# Describes a table loaded into its staging table and waiting to be swapped in.
+LoadResult = Dict[str, Any]
+
+# Settings of the COPY extraction backend: the PostgreSQL connection settings
+# ("postgres_config"), the size of the CSV blocks streamed at a time ("batch_bytes")
+# and optionally an exported snapshot to read in ("snapshot"). Tables read without it
+# are scanned through the postgres extension.
+CopyConfig = Dict[str, Any]
+
+# A table as described by a pgoutput relation message: its name, its columns and the
+# columns of its replica identity ("key_columns").
+Relation = Dict[str, Any]
+
+# A decoded pgoutput message: "begin", "commit", "insert", "update", "delete" or
+# "truncate" ("type"), with its LSNs or its relation and row values.
+Change = Dict[str, Any]
+
+# Changes of committed transactions waiting to be applied to DuckDB, by table, as
+# segments of row deletes applied before row inserts (see add_change).
+ChangeBatch = Dict[str, Any]
+
+# Stands for a TOAST value an update left unchanged, which pgoutput does not resend.
+UNCHANGED_TOAST = object()
+
 
 def create_and_attach_secret(
     conn: duckdb.DuckDBPyConnection, secret_name: str, postgres_config: Dict[str, str]
@@ -40,73 +126,1592 @@ def create_and_attach_secret(
     logging.info("PostgreSQL connection attached successfully.")
 
 
-def drop_all_tables(conn: duckdb.DuckDBPyConnection) -> None:
+def select_list(columns: Optional[List[str]]) -> str:
+    """
+    Returns the select list of a column projection, or ``*`` without one.
+    """
+    if not columns:
+        return "*"
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def order_by_clause(sort_by: Optional[List[str]]) -> str:
+    """
+    Returns the ORDER BY clause of a target sort order, or an empty string without one.
+    """
+    if not sort_by:
+        return ""
+    return "ORDER BY " + ", ".join(f'"{column}"' for column in sort_by)
+
+
+def sort_table(
+    conn: duckdb.DuckDBPyConnection, target: str, sort_by: Optional[List[str]]
+) -> None:
+    """
+    Rewrites a staged table in the given sort order, so that the min/max statistics
+    of its row groups can skip data for filters on the leading sort columns.
+    """
+    if not sort_by:
+        return
+    conn.execute(
+        f"CREATE OR REPLACE TABLE {target} AS "
+        f"SELECT * FROM {target} {order_by_clause(sort_by)};"
+    )
+
+
+def extract_to_table(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    target: str,
+    where: str = "TRUE",
+    params: Tuple[Any, ...] = (),
+    copy_config: Optional[CopyConfig] = None,
+    columns: Optional[List[str]] = None,
+    snapshot: Optional[str] = None,
+) -> int:
+    """
+    Copies the rows of a PostgreSQL table matching a predicate into a DuckDB table and
+    validates the copied row count against the source. Only the given columns are
+    copied when a projection is given.
+
+    The copy and the source count run in one transaction, so both read the same
+    PostgreSQL snapshot, which is the exported ``snapshot`` when one is given. With a
+    ``copy_config`` the rows are streamed with ``COPY`` instead (see
+    ``copy_to_table``). Returns the number of rows copied.
+    """
+    if copy_config is not None:
+        if snapshot is not None:
+            copy_config = {**copy_config, "snapshot": snapshot}
+        return copy_to_table(
+            conn, table_name, target, where, params, copy_config, columns
+        )
+
+    conn.execute("BEGIN TRANSACTION;")
+    try:
+        if snapshot is not None:
+            # Must come before anything else in the transaction reads PostgreSQL.
+            conn.execute(
+                "CALL postgres_execute('postgres_db', "
+                f"'SET TRANSACTION SNAPSHOT ''{snapshot}''');"
+            )
+        conn.execute(f"DROP TABLE IF EXISTS {target};")
+        conn.execute(
+            f"""
+            CREATE TABLE {target} AS
+            SELECT {select_list(columns)} FROM postgres_db.{table_name}
+            WHERE {where};
+            """,
+            params,
+        )
+        loaded_rows = conn.execute(f"SELECT COUNT(*) FROM {target};").fetchone()[0]
+        source_rows = conn.execute(
+            f"SELECT COUNT(*) FROM postgres_db.{table_name} WHERE {where};", params
+        ).fetchone()[0]
+        if loaded_rows != source_rows:
+            raise RuntimeError(
+                f"Row count mismatch for {table_name}: "
+                f"loaded {loaded_rows}, source has {source_rows}"
+            )
+        conn.execute("COMMIT;")
+    except Exception:
+        conn.execute("ROLLBACK;")
+        raise
+
+    return loaded_rows
+
+
+def _stream_copy(
+    pg_cursor: Any,
+    select: str,
+    conn: duckdb.DuckDBPyConnection,
+    target: str,
+    batch_bytes: int,
+) -> None:
+    """
+    Runs ``COPY (select) TO STDOUT`` in a background thread that writes into an OS
+    pipe, and inserts the CSV read from the other end into the target table as a
+    stream of Arrow record batches of about ``batch_bytes`` each. The pipe applies
+    backpressure, so only a few blocks are buffered at any time.
+    """
+    columns = [row[0] for row in conn.execute(f"DESCRIBE {target};").fetchall()]
+    read_options = pyarrow.csv.ReadOptions(block_size=batch_bytes)
+    parse_options = pyarrow.csv.ParseOptions(newlines_in_values=True)
+    # Every column is read as text and cast by DuckDB on insert. PostgreSQL writes
+    # NULL as an empty field and an empty string as "".
+    convert_options = pyarrow.csv.ConvertOptions(
+        column_types={column: pa.string() for column in columns},
+        null_values=[""],
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+    )
+
+    read_fd, write_fd = os.pipe()
+
+    def produce() -> None:
+        with os.fdopen(write_fd, "wb") as sink:
+            pg_cursor.copy_expert(
+                f"COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                sink,
+                size=batch_bytes,
+            )
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        producer = executor.submit(produce)
+        try:
+            # Closing the read end on error makes the producer stop on a broken pipe.
+            with os.fdopen(read_fd, "rb") as source:
+                reader = pyarrow.csv.open_csv(
+                    source,
+                    read_options=read_options,
+                    parse_options=parse_options,
+                    convert_options=convert_options,
+                )
+                # DuckDB consumes the reader as a stream in a single statement.
+                conn.register("copy_stream", reader)
+                try:
+                    conn.execute(
+                        f"INSERT INTO {target} BY NAME SELECT * FROM copy_stream;"
+                    )
+                finally:
+                    conn.unregister("copy_stream")
+        except Exception as e:
+            # A failed COPY ends the stream early; report it rather than the parse
+            # error it causes on this side.
+            producer_error = producer.exception()
+            if isinstance(producer_error, psycopg2.Error):
+                raise producer_error from e
+            raise
+        producer.result()
+
+
+def connect_duckdb(duckdb_config: Dict[str, Any]) -> duckdb.DuckDBPyConnection:
+    """
+    Opens the DuckDB database with the settings of the execution profile the import
+    spec selects (see ``load_config``).
+    """
+    return duckdb.connect(
+        duckdb_config["path"], config=duckdb_config.get("settings", {})
+    )
+
+
+def connect_postgres(
+    postgres_config: Dict[str, str], connection_factory: Optional[Any] = None
+) -> Any:
+    """
+    Opens a direct psycopg2 connection to the PostgreSQL source.
+    """
+    return psycopg2.connect(
+        host=postgres_config["host"],
+        port=postgres_config["port"],
+        dbname=postgres_config["database"],
+        user=postgres_config["user"],
+        password=postgres_config["password"],
+        connection_factory=connection_factory,
+    )
+
+
+def copy_to_table(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    target: str,
+    where: str,
+    params: Tuple[Any, ...],
+    copy_config: CopyConfig,
+    columns: Optional[List[str]] = None,
+) -> int:
+    """
+    Streams the rows of a PostgreSQL table matching a predicate into a DuckDB table
+    with ``COPY (SELECT ...) TO STDOUT`` over a direct connection, bypassing the
+    postgres extension's scan, and validates the copied row count against the source.
+
+    Memory use is bounded by ``batch_bytes`` regardless of the table size. The target
+    takes the column types the postgres extension maps the table to, so both
+    extraction methods produce the same table. The COPY and the source count run in
+    one read-only repeatable read transaction and see the same snapshot, which is the
+    exported ``snapshot`` of the copy config when it has one. Returns the number of
+    rows copied.
+    """
+    postgres_config = copy_config["postgres_config"]
+    batch_bytes = copy_config.get("batch_bytes", COPY_BATCH_BYTES)
+
+    pg_conn = connect_postgres(postgres_config)
+    try:
+        pg_conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with pg_conn.cursor() as pg_cursor:
+            if copy_config.get("snapshot"):
+                pg_cursor.execute(
+                    "SET TRANSACTION SNAPSHOT %s;", (copy_config["snapshot"],)
+                )
+            # COPY takes no bind parameters, so they are rendered into the query.
+            predicate = where.replace("%", "%%").replace("?", "%s")
+            select = pg_cursor.mogrify(
+                f"SELECT {select_list(columns)} FROM {table_name} WHERE {predicate}",
+                params,
+            ).decode()
+            pg_cursor.execute(f"SELECT COUNT(*) FROM ({select}) AS source;")
+            source_rows = pg_cursor.fetchone()[0]
+
+            conn.execute("BEGIN TRANSACTION;")
+            try:
+                conn.execute(f"DROP TABLE IF EXISTS {target};")
+                conn.execute(
+                    f"CREATE TABLE {target} AS "
+                    f"SELECT {select_list(columns)} "
+                    f"FROM postgres_db.{table_name} LIMIT 0;"
+                )
+                _stream_copy(pg_cursor, select, conn, target, batch_bytes)
+                loaded_rows = conn.execute(
+                    f"SELECT COUNT(*) FROM {target};"
+                ).fetchone()[0]
+                if loaded_rows != source_rows:
+                    raise RuntimeError(
+                        f"Row count mismatch for {table_name}: "
+                        f"loaded {loaded_rows}, source has {source_rows}"
+                    )
+                conn.execute("COMMIT;")
+            except Exception:
+                conn.execute("ROLLBACK;")
+                raise
+    finally:
+        pg_conn.close()
+
+    return loaded_rows
+
+
+def import_table(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    cursor_column: Optional[str] = None,
+    partition_column: Optional[str] = None,
+    parallelism: int = 1,
+    copy_config: Optional[CopyConfig] = None,
+    columns: Optional[List[str]] = None,
+    sort_by: Optional[List[str]] = None,
+) -> LoadResult:
+    """
+    Loads a full copy of a PostgreSQL table, or of the given columns of it, into its
+    shadow table in the given sort order, leaving the live table untouched until
+    ``swap_tables`` runs.
+
+    When a partition column and a parallelism above one are given, the table is
+    extracted as key ranges over several connections (see ``extract_partitioned``).
+    With a ``copy_config`` the rows are streamed with ``COPY`` (see ``copy_to_table``).
+    """
+    logging.info(f"Starting import for table: {table_name}")
+
+    shadow_table = f"{table_name}{SHADOW_SUFFIX}"
+    safe_shadow_table = f'"{shadow_table}"'
+
+    try:
+        if partition_column and parallelism > 1:
+            rows = extract_partitioned(
+                conn,
+                table_name,
+                safe_shadow_table,
+                partition_column,
+                parallelism,
+                copy_config,
+                columns,
+                sort_by,
+            )
+        else:
+            rows = extract_to_table(
+                conn,
+                table_name,
+                safe_shadow_table,
+                copy_config=copy_config,
+                columns=columns,
+            )
+            sort_table(conn, safe_shadow_table, sort_by)
+
+        high_water_mark = None
+        if cursor_column:
+            high_water_mark = conn.execute(
+                f'SELECT MAX("{cursor_column}") FROM {safe_shadow_table};'
+            ).fetchone()[0]
+    except (duckdb.Error, psycopg2.Error, pa.ArrowException, RuntimeError) as e:
+        logging.error(f"Error importing table {table_name}: {e}")
+        raise RuntimeError(f"Error importing table {table_name}: {e}")
+
+    logging.info(f"Successfully staged table: {table_name} ({rows} rows)")
+    return {
+        "table_name": table_name,
+        "strategy": "full",
+        "staged_table": shadow_table,
+        "rows": rows,
+        "cursor_column": cursor_column,
+        "high_water_mark": high_water_mark,
+    }
+
+
+def get_partition_ranges(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    partition_column: str,
+    partitions: int,
+) -> List[Tuple[Optional[Any], Optional[Any]]]:
+    """
+    Splits the value range of a numeric or date column of a PostgreSQL table into
+    equal-width ``[lower, upper)`` ranges. The first range has no lower bound and the
+    last has no upper bound, so together they cover every row.
+    """
+    low, high = conn.execute(
+        f'SELECT MIN("{partition_column}"), MAX("{partition_column}") '
+        f"FROM postgres_db.{table_name};"
+    ).fetchone()
+
+    if low is None or low == high:
+        return [(None, None)]
+
+    is_date = isinstance(low, datetime.date)
+    if is_date:
+        low, high = low.toordinal(), high.toordinal()
+
+    step = (high - low) / partitions
+    bounds = [low + round(step * i) for i in range(1, partitions)]
+    bounds = sorted(set(b for b in bounds if low < b <= high))
+    if is_date:
+        bounds = [datetime.date.fromordinal(b) for b in bounds]
+
+    lowers = [None] + bounds
+    uppers = bounds + [None]
+    return list(zip(lowers, uppers))
+
+
+def is_postgres_attach(conn: duckdb.DuckDBPyConnection) -> bool:
+    """
+    Checks whether postgres_db is attached through the postgres extension, rather than
+    being e.g. the DuckDB source file of the benchmarks.
+    """
+    result = conn.execute(
+        "SELECT type FROM duckdb_databases() WHERE database_name = 'postgres_db';"
+    ).fetchone()
+    return result is not None and result[0] == "postgres"
+
+
+def _extract_range(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    part_table: str,
+    partition_column: str,
+    lower: Optional[Any],
+    upper: Optional[Any],
+    copy_config: Optional[CopyConfig] = None,
+    columns: Optional[List[str]] = None,
+    snapshot: Optional[str] = None,
+) -> int:
+    """
+    Copies one key range of a PostgreSQL table into a part table on its own cursor,
+    reading the given exported snapshot, and returns the number of rows copied.
     """
-    Drops all existing tables in all schemas in the DuckDB database to ensure a clean reload.
+    conditions = []
+    params = []
+    if lower is not None:
+        conditions.append(f'"{partition_column}" >= ?')
+        params.append(lower)
+    if upper is not None:
+        conditions.append(f'"{partition_column}" < ?')
+        params.append(upper)
+    where = " AND ".join(conditions) if conditions else "TRUE"
+    if lower is None:
+        # Rows with a NULL partition key belong to the first range.
+        where = f'({where}) OR "{partition_column}" IS NULL'
+
+    cursor = conn.cursor()
+    try:
+        return extract_to_table(
+            cursor,
+            table_name,
+            f'{PARTS_SCHEMA}."{part_table}"',
+            where,
+            tuple(params),
+            copy_config,
+            columns,
+            snapshot,
+        )
+    finally:
+        cursor.close()
+
+
+def extract_partitioned(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    target: str,
+    partition_column: str,
+    parallelism: int,
+    copy_config: Optional[CopyConfig] = None,
+    columns: Optional[List[str]] = None,
+    sort_by: Optional[List[str]] = None,
+) -> int:
     """
-    logging.info("Fetching list of existing tables in DuckDB...")
-    tables = conn.execute(
+    Copies a PostgreSQL table into a DuckDB table by splitting it into key ranges on
+    the partition column and pulling the ranges concurrently, each over its own
+    DuckDB cursor and therefore its own PostgreSQL connection. The ranges land in part
+    tables that are assembled into the target table, in the given sort order, in a
+    single final transaction. Returns the number of rows copied.
+
+    Every range reads the same PostgreSQL snapshot, so writes committed during the
+    extraction cannot tear the copy: the snapshot of the copy config if it has one,
+    or else one exported by a transaction held open until all ranges are copied. A
+    source that is not a PostgreSQL attach has no snapshots to share, and each range
+    reads it in a transaction of its own.
+    """
+    ranges = get_partition_ranges(conn, table_name, partition_column, parallelism)
+    part_tables = [f"{table_name}_{i}" for i in range(len(ranges))]
+    logging.info(
+        f"Extracting {table_name} in {len(ranges)} ranges of {partition_column} "
+        f"with {parallelism} workers..."
+    )
+
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {PARTS_SCHEMA};")
+
+    try:
+        snapshot = (copy_config or {}).get("snapshot")
+        snapshot_cursor = None
+        if snapshot is None and is_postgres_attach(conn):
+            snapshot_cursor = conn.cursor()
+            snapshot_cursor.execute("BEGIN TRANSACTION;")
+            snapshot = snapshot_cursor.execute(
+                "SELECT * FROM postgres_query("
+                "'postgres_db', 'SELECT pg_export_snapshot()');"
+            ).fetchone()[0]
+        try:
+            with ThreadPoolExecutor(max_workers=parallelism) as executor:
+                futures = [
+                    executor.submit(
+                        _extract_range,
+                        conn,
+                        table_name,
+                        part_table,
+                        partition_column,
+                        lower,
+                        upper,
+                        copy_config,
+                        columns,
+                        snapshot,
+                    )
+                    for part_table, (lower, upper) in zip(part_tables, ranges)
+                ]
+                row_counts = [future.result() for future in futures]
+        finally:
+            if snapshot_cursor is not None:
+                snapshot_cursor.execute("ROLLBACK;")
+                snapshot_cursor.close()
+
+        union = " UNION ALL ".join(
+            f'SELECT * FROM {PARTS_SCHEMA}."{part_table}"' for part_table in part_tables
+        )
+        conn.execute("BEGIN TRANSACTION;")
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {target};")
+            conn.execute(
+                f"CREATE TABLE {target} AS "
+                f"SELECT * FROM ({union}) AS parts {order_by_clause(sort_by)};"
+            )
+            conn.execute("COMMIT;")
+        except duckdb.Error:
+            conn.execute("ROLLBACK;")
+            raise
+    finally:
+        for part_table in part_tables:
+            conn.execute(f'DROP TABLE IF EXISTS {PARTS_SCHEMA}."{part_table}";')
+
+    return sum(row_counts)
+
+
+def table_exists(conn: duckdb.DuckDBPyConnection, table_name: str) -> bool:
+    """
+    Checks whether a table exists in the main schema of the DuckDB database.
+    """
+    result = conn.execute(
         """
-        SELECT table_schema, table_name 
+        SELECT COUNT(*)
         FROM information_schema.tables
-        WHERE table_schema NOT IN ('information_schema', 'pg_catalog', 'duckdb_internal')
+        WHERE table_catalog = current_database()
+          AND table_schema = 'main'
+          AND table_name = ?
+        """,
+        (table_name,),
+    ).fetchone()
+    return result[0] > 0
+
+
+def ensure_state_table(conn: duckdb.DuckDBPyConnection) -> None:
+    """
+    Creates the table holding the per-table high-water marks used by incremental syncs.
+    """
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            table_name VARCHAR PRIMARY KEY,
+            cursor_column VARCHAR NOT NULL,
+            high_water_mark VARCHAR,
+            updated_at TIMESTAMP NOT NULL
+        );
         """
-    ).fetchall()
+    )
+
+
+def get_high_water_mark(
+    conn: duckdb.DuckDBPyConnection, table_name: str, cursor_column: str
+) -> Optional[str]:
+    """
+    Returns the stored high-water mark for a table, or None if the table has never
+    been synced with the given cursor column.
+    """
+    result = conn.execute(
+        f"""
+        SELECT high_water_mark
+        FROM {STATE_TABLE}
+        WHERE table_name = ? AND cursor_column = ?
+        """,
+        (table_name, cursor_column),
+    ).fetchone()
+    return result[0] if result else None
+
+
+def set_high_water_mark(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    cursor_column: str,
+    high_water_mark: Optional[Any],
+) -> None:
+    """
+    Stores the high-water mark for a table. Values are kept as text so any orderable
+    cursor column (integer ids, dates, timestamps) can be tracked.
+    """
+    conn.execute(f"DELETE FROM {STATE_TABLE} WHERE table_name = ?;", (table_name,))
+    conn.execute(
+        f"""
+        INSERT INTO {STATE_TABLE} VALUES (?, ?, ?, current_timestamp::TIMESTAMP);
+        """,
+        (
+            table_name,
+            cursor_column,
+            None if high_water_mark is None else str(high_water_mark),
+        ),
+    )
+
+
+def import_table_incremental(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    cursor_column: str,
+    key_column: Optional[str] = None,
+    partition_column: Optional[str] = None,
+    parallelism: int = 1,
+    copy_config: Optional[CopyConfig] = None,
+    columns: Optional[List[str]] = None,
+    sort_by: Optional[List[str]] = None,
+) -> LoadResult:
+    """
+    Stages only the rows of a PostgreSQL table whose cursor column is above the stored
+    high-water mark, to be merged into the existing DuckDB table by ``swap_tables``.
+
+    When a key column is given, rows already present with the same key are replaced,
+    so a cursor such as an ``updated_at`` column also picks up changed rows. Without a
+    key column the new rows are appended. The delta is sorted in the given sort order
+    before it is appended. Falls back to a full import when the table or its
+    high-water mark does not exist yet.
+    """
+    high_water_mark = get_high_water_mark(conn, table_name, cursor_column)
+
+    if not table_exists(conn, table_name) or high_water_mark is None:
+        logging.info(
+            f"No previous sync state for {table_name}, falling back to full import..."
+        )
+        return import_table(
+            conn,
+            table_name,
+            cursor_column,
+            partition_column,
+            parallelism,
+            copy_config,
+            columns,
+            sort_by,
+        )
+
+    logging.info(
+        f"Starting incremental import for table: {table_name} "
+        f"({cursor_column} > {high_water_mark})"
+    )
+
+    delta_table = f"{table_name}{DELTA_SUFFIX}"
+    safe_delta_table = f'"{delta_table}"'
+
+    try:
+        rows = extract_to_table(
+            conn,
+            table_name,
+            safe_delta_table,
+            f'"{cursor_column}" > ?',
+            (high_water_mark,),
+            copy_config,
+            columns,
+        )
+        sort_table(conn, safe_delta_table, sort_by)
+        new_high_water_mark = conn.execute(
+            f'SELECT MAX("{cursor_column}") FROM {safe_delta_table};'
+        ).fetchone()[0]
+    except (duckdb.Error, psycopg2.Error, pa.ArrowException, RuntimeError) as e:
+        logging.error(f"Error importing table {table_name} incrementally: {e}")
+        raise RuntimeError(f"Error importing table {table_name} incrementally: {e}")
+
+    logging.info(f"Staged {rows} new or changed rows for table: {table_name}")
+    return {
+        "table_name": table_name,
+        "strategy": "incremental",
+        "staged_table": delta_table,
+        "rows": rows,
+        "key_column": key_column,
+        "cursor_column": cursor_column,
+        "high_water_mark": new_high_water_mark,
+    }
+
+
+def drop_staged_tables(
+    conn: duckdb.DuckDBPyConnection, loads: List[LoadResult]
+) -> None:
+    """
+    Drops the shadow and delta tables left behind by a set of loads.
+    """
+    for load in loads:
+        conn.execute(f'DROP TABLE IF EXISTS "{load["staged_table"]}";')
+
+
+def swap_tables(conn: duckdb.DuckDBPyConnection, loads: List[LoadResult]) -> None:
+    """
+    Publishes every staged load in a single transaction: full loads replace the live
+    table with their shadow table, incremental loads merge their delta into it, and
+    the new high-water marks are stored alongside. Readers see either the previous
+    snapshot or the new one, and a failure leaves the previous snapshot in place.
+    """
+    logging.info(f"Swapping {len(loads)} staged tables into place...")
+
+    conn.execute("BEGIN TRANSACTION;")
+    try:
+        for load in loads:
+            safe_table_name = f'"{load["table_name"]}"'
+            safe_staged_table = f'"{load["staged_table"]}"'
+
+            if load["strategy"] == "full":
+                conn.execute(f"DROP TABLE IF EXISTS {safe_table_name};")
+                conn.execute(
+                    f"ALTER TABLE {safe_staged_table} RENAME TO {safe_table_name};"
+                )
+            else:
+                if load["rows"] and load["key_column"]:
+                    key_column = f'"{load["key_column"]}"'
+                    conn.execute(
+                        f"""
+                        DELETE FROM {safe_table_name}
+                        WHERE {key_column} IN (SELECT {key_column} FROM {safe_staged_table});
+                        """
+                    )
+                if load["rows"]:
+                    conn.execute(
+                        f"INSERT INTO {safe_table_name} SELECT * FROM {safe_staged_table};"
+                    )
+                conn.execute(f"DROP TABLE {safe_staged_table};")
+
+            if load["cursor_column"] and load["high_water_mark"] is not None:
+                set_high_water_mark(
+                    conn,
+                    load["table_name"],
+                    load["cursor_column"],
+                    load["high_water_mark"],
+                )
+
+        conn.execute("COMMIT;")
+    except duckdb.Error as e:
+        conn.execute("ROLLBACK;")
+        drop_staged_tables(conn, loads)
+        logging.error(f"Error swapping staged tables: {e}")
+        raise RuntimeError(f"Error swapping staged tables: {e}")
+
+    for load in loads:
+        logging.info(
+            f"Published table: {load['table_name']} "
+            f"({load['strategy']}, {load['rows']} rows)"
+        )
+
+
+def validate_table_settings(table_name: str, settings: Dict[str, Any]) -> None:
+    """
+    Checks the settings of a table in the import spec, raising ValueError on unknown
+    keys, on values of the wrong type and on combinations the importer cannot run.
+    """
+    unknown_keys = settings.keys() - TABLE_SETTINGS
+    if unknown_keys:
+        raise ValueError(
+            f"Unknown settings for {table_name}: {', '.join(sorted(unknown_keys))}"
+        )
+    for key in ("cursor_column", "key_column", "partition_column"):
+        if key in settings and not isinstance(settings[key], str):
+            raise ValueError(f"{key} for {table_name} must be a column name")
+    for key in ("columns", "sort_by"):
+        value = settings.get(key, [])
+        if not isinstance(value, list) or not all(
+            isinstance(column, str) for column in value
+        ):
+            raise ValueError(f"{key} for {table_name} must be a list of column names")
+    for key in ("parallelism", "batch_bytes"):
+        value = settings.get(key, 1)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValueError(f"{key} for {table_name} must be a positive integer")
+
+    cursor_column = settings.get("cursor_column")
+    strategy = settings.get("strategy", "incremental" if cursor_column else "full")
+    if strategy not in LOAD_STRATEGIES:
+        raise ValueError(f"Unknown strategy for {table_name}: {strategy}")
+    if strategy == "incremental" and not cursor_column:
+        raise ValueError(f"Incremental strategy for {table_name} needs cursor_column")
+
+    extract_method = settings.get("extract_method", "scan")
+    if extract_method not in EXTRACT_METHODS:
+        raise ValueError(f"Unknown extract_method for {table_name}: {extract_method}")
+
+    columns = settings.get("columns")
+    if columns is not None:
+        if not columns:
+            raise ValueError(f"Empty column projection for {table_name}")
+        required = [
+            settings.get(key)
+            for key in ("cursor_column", "key_column", "partition_column")
+        ] + settings.get("sort_by", [])
+        missing = [column for column in required if column and column not in columns]
+        if missing:
+            raise ValueError(
+                f"Column projection for {table_name} lacks: {', '.join(missing)}"
+            )
+
 
+def load_config(path: str) -> Dict[str, Any]:
+    """
+    Reads and validates the TOML import spec: the DuckDB database (``[duckdb]``) and
+    the execution profile its connections use (``[profiles.<name>]``), the PostgreSQL
+    connection (``[postgres]``, overridable by the ``POSTGRES_*`` environment
+    variables), the settings of every table to import (``[tables.<name>]``) and of
+    the change stream used by ``--cdc`` (``[cdc]``). The settings of the selected
+    profile are stored as ``config["duckdb"]["settings"]``.
+    """
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+
+    postgres_config = dict(config.get("postgres", {}))
+    for key, variable in POSTGRES_ENV_OVERRIDES.items():
+        if variable in os.environ:
+            postgres_config[key] = os.environ[variable]
+    config["postgres"] = postgres_config
+
+    if "path" not in config.get("duckdb", {}):
+        raise ValueError(f"No DuckDB path in {path}")
+    profile = config["duckdb"].get("profile")
+    if profile is not None:
+        settings = config.get("profiles", {}).get(profile)
+        if settings is None:
+            raise ValueError(f"Unknown execution profile {profile} in {path}")
+        unknown_keys = settings.keys() - PROFILE_SETTINGS
+        if unknown_keys:
+            raise ValueError(
+                f"Unknown settings in profile {profile}: {', '.join(sorted(unknown_keys))}"
+            )
+        config["duckdb"]["settings"] = settings
+    tables = config.get("tables")
     if not tables:
-        logging.info("No tables found to drop.")
+        raise ValueError(f"No tables in {path}")
+    for table_name, settings in tables.items():
+        validate_table_settings(table_name, settings)
+    unknown_keys = config.get("cdc", {}).keys() - CDC_DEFAULTS.keys()
+    if unknown_keys:
+        raise ValueError(f"Unknown [cdc] settings: {', '.join(sorted(unknown_keys))}")
+
+    return config
+
+
+def sync_table(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    settings: Dict[str, Any],
+    full_refresh: bool,
+    postgres_config: Optional[Dict[str, str]] = None,
+) -> LoadResult:
+    """
+    Stages a single table according to its settings, on a dedicated cursor so that
+    several tables can be loaded concurrently.
+
+    The ``strategy`` setting is ``"incremental"`` (the default for tables with a
+    ``cursor_column``) or ``"full"``; every table is reloaded in full when
+    ``full_refresh`` is set. The ``extract_method`` setting picks how rows are read:
+    ``"scan"`` (the default) through the postgres extension, or ``"copy"`` streamed
+    with ``COPY`` over a direct connection using ``postgres_config``, in blocks of
+    ``batch_bytes``. ``columns`` limits the copy to a projection and ``sort_by`` sets
+    the order the rows are stored in.
+    """
+    validate_table_settings(table_name, settings)
+    cursor_column = settings.get("cursor_column")
+    partition_column = settings.get("partition_column")
+    parallelism = settings.get("parallelism", 1)
+    strategy = settings.get("strategy", "incremental" if cursor_column else "full")
+    columns = settings.get("columns")
+    sort_by = settings.get("sort_by")
+
+    copy_config = None
+    if settings.get("extract_method", "scan") == "copy":
+        if postgres_config is None:
+            raise ValueError(
+                f"extract_method 'copy' for {table_name} needs postgres_config"
+            )
+        copy_config = {
+            "postgres_config": postgres_config,
+            "batch_bytes": settings.get("batch_bytes", COPY_BATCH_BYTES),
+        }
+
+    cursor = conn.cursor()
+    try:
+        if strategy == "incremental" and not full_refresh:
+            return import_table_incremental(
+                cursor,
+                table_name,
+                cursor_column,
+                settings.get("key_column"),
+                partition_column,
+                parallelism,
+                copy_config,
+                columns,
+                sort_by,
+            )
+        return import_table(
+            cursor,
+            table_name,
+            cursor_column,
+            partition_column,
+            parallelism,
+            copy_config,
+            columns,
+            sort_by,
+        )
+    finally:
+        cursor.close()
+
+
+def parse_lsn(lsn: str) -> int:
+    """
+    Converts a PostgreSQL LSN such as ``0/16B3748`` to an integer.
+    """
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def format_lsn(lsn: int) -> str:
+    """
+    Formats an integer LSN the way PostgreSQL writes it.
+    """
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+def ensure_cdc_state_table(conn: duckdb.DuckDBPyConnection) -> None:
+    """
+    Creates the table holding, per replication slot, the end LSN of the last
+    transaction applied to DuckDB.
+    """
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CDC_STATE_TABLE} (
+            slot_name VARCHAR PRIMARY KEY,
+            lsn UBIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        );
+        """
+    )
+
+
+def get_cdc_lsn(conn: duckdb.DuckDBPyConnection, slot_name: str) -> Optional[int]:
+    """
+    Returns the LSN up to which changes of a replication slot have been applied, or
+    None if the slot has never been synced.
+    """
+    result = conn.execute(
+        f"SELECT lsn FROM {CDC_STATE_TABLE} WHERE slot_name = ?;", (slot_name,)
+    ).fetchone()
+    return result[0] if result else None
+
+
+def set_cdc_lsn(conn: duckdb.DuckDBPyConnection, slot_name: str, lsn: int) -> None:
+    """
+    Stores the LSN up to which changes of a replication slot have been applied.
+    """
+    conn.execute(f"DELETE FROM {CDC_STATE_TABLE} WHERE slot_name = ?;", (slot_name,))
+    conn.execute(
+        f"INSERT INTO {CDC_STATE_TABLE} VALUES (?, ?, current_timestamp::TIMESTAMP);",
+        (slot_name, lsn),
+    )
+
+
+def decode_pgoutput(payload: bytes, relations: Dict[int, Relation]) -> Optional[Change]:
+    """
+    Decodes a message of the ``pgoutput`` logical replication protocol, version 1.
+    Relation messages are stored in ``relations`` by relation id, as row messages
+    only refer to their relation by id. Returns None for those and for the message
+    types the importer does not use.
+
+    Row values are returned as text, or None for NULL, or UNCHANGED_TOAST.
+    """
+    pos = 1
+
+    def read(fmt: str) -> Tuple[Any, ...]:
+        nonlocal pos
+        values = struct.unpack_from(fmt, payload, pos)
+        pos += struct.calcsize(fmt)
+        return values
+
+    def read_string() -> str:
+        nonlocal pos
+        end = payload.index(b"\0", pos)
+        value = payload[pos:end].decode()
+        pos = end + 1
+        return value
+
+    def read_tuple() -> List[Any]:
+        nonlocal pos
+        (count,) = read("!h")
+        values = []
+        for _ in range(count):
+            (kind,) = read("!c")
+            if kind == b"t":
+                (length,) = read("!i")
+                values.append(payload[pos : pos + length].decode())
+                pos += length
+            elif kind == b"n":
+                values.append(None)
+            elif kind == b"u":
+                values.append(UNCHANGED_TOAST)
+            else:
+                raise RuntimeError(f"Unsupported pgoutput tuple value: {kind!r}")
+        return values
+
+    message_type = payload[:1]
+    if message_type == b"B":
+        final_lsn, _, _ = read("!QqI")
+        return {"type": "begin", "lsn": final_lsn}
+    if message_type == b"C":
+        _, commit_lsn, end_lsn, _ = read("!BQQq")
+        return {"type": "commit", "lsn": commit_lsn, "end_lsn": end_lsn}
+    if message_type == b"R":
+        (relation_id,) = read("!I")
+        read_string()
+        table_name = read_string()
+        read("!c")
+        (count,) = read("!h")
+        columns, key_columns = [], []
+        for _ in range(count):
+            (flags,) = read("!B")
+            column = read_string()
+            read("!Ii")
+            columns.append(column)
+            if flags & 1:
+                key_columns.append(column)
+        relations[relation_id] = {
+            "table_name": table_name,
+            "columns": columns,
+            "key_columns": key_columns,
+        }
+        return None
+    if message_type in (b"I", b"U", b"D"):
+        (relation_id,) = read("!I")
+        relation = relations[relation_id]
+        (kind,) = read("!c")
+        old = None
+        if kind in (b"K", b"O"):
+            old = dict(zip(relation["columns"], read_tuple()))
+            if message_type == b"U":
+                read("!c")
+        new = None
+        if message_type != b"D":
+            new = dict(zip(relation["columns"], read_tuple()))
+        change_type = {b"I": "insert", b"U": "update", b"D": "delete"}[message_type]
+        return {"type": change_type, "relation": relation, "old": old, "new": new}
+    if message_type == b"T":
+        count, _ = read("!iB")
+        relation_ids = read(f"!{count}I")
+        return {
+            "type": "truncate",
+            "relations": [relations[relation_id] for relation_id in relation_ids],
+        }
+    return None
+
+
+def new_change_batch() -> ChangeBatch:
+    """
+    Returns an empty micro-batch of changes.
+    """
+    return {
+        "tables": {},
+        "changes": 0,
+        "end_lsn": None,
+        "started_at": None,
+        "retry_at": None,
+    }
+
+
+def add_change(batch: ChangeBatch, change: Change) -> None:
+    """
+    Adds a decoded insert, update, delete or truncate to a micro-batch.
+
+    Every change becomes row deletes and row inserts, an update being a delete of its
+    old row followed by an insert of its new one. Deleted rows are identified by the
+    values of their replica identity columns. The rows of a table are grouped in
+    segments, each applied as one set-based delete followed by one set-based insert.
+    That order is only safe while no delete targets a row inserted earlier in the
+    same segment, so such a delete starts a new segment. A truncate drops the pending
+    segments of its tables.
+    """
+    if batch["started_at"] is None:
+        batch["started_at"] = time.monotonic()
+    batch["changes"] += 1
+
+    if change["type"] == "truncate":
+        for relation in change["relations"]:
+            batch["tables"][relation["table_name"]] = [
+                {"truncate": True, "deletes": [], "inserts": [], "inserted_keys": {}}
+            ]
         return
 
-    for schema, table_name in tables:
-        conn.execute(f'DROP TABLE IF EXISTS "{schema}"."{table_name}";')
-        logging.info(f"Dropped table: {schema}.{table_name}")
+    relation = change["relation"]
+    key_columns = relation["key_columns"]
+    old, new = change["old"], change["new"]
+    if change["type"] == "update" and old is None:
+        # Without an old row the replica identity did not change.
+        old = new
+    if new is not None and UNCHANGED_TOAST in new.values():
+        if old is None or UNCHANGED_TOAST in old.values():
+            raise RuntimeError(
+                f"Unchanged TOAST value in {relation['table_name']} cannot be "
+                f"restored; set its REPLICA IDENTITY to FULL"
+            )
+        new = {
+            column: old[column] if value is UNCHANGED_TOAST else value
+            for column, value in new.items()
+        }
+
+    segments = batch["tables"].setdefault(relation["table_name"], [])
+    if not segments:
+        segments.append(
+            {"truncate": False, "deletes": [], "inserts": [], "inserted_keys": {}}
+        )
+    segment = segments[-1]
 
-    logging.info("All existing tables dropped from all schemas.")
+    if change["type"] != "insert":
+        key = tuple(old[column] for column in key_columns)
+        if segment["inserted_keys"].get(key):
+            segment = {
+                "truncate": False,
+                "deletes": [],
+                "inserts": [],
+                "inserted_keys": {},
+            }
+            segments.append(segment)
+        segment["deletes"].append({column: old[column] for column in key_columns})
+    if new is not None:
+        key = tuple(new[column] for column in key_columns)
+        segment["inserted_keys"][key] = segment["inserted_keys"].get(key, 0) + 1
+        segment["inserts"].append(new)
 
 
-def import_table(conn: duckdb.DuckDBPyConnection, table_name: str) -> None:
+def _register_rows(
+    conn: duckdb.DuckDBPyConnection, rows: List[Dict[str, Any]], columns: List[str]
+) -> None:
     """
-    Import a table from PostgreSQL into DuckDB, ensuring atomic reload.
+    Registers rows of text values as the ``cdc_rows`` view.
     """
-    logging.info(f"Starting import for table: {table_name}")
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    conn.register("cdc_rows", pa.Table.from_pylist(rows, schema=schema))
+
 
-    safe_table_name = f'"{table_name}"'
+def _delete_rows(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    column_types: Dict[str, str],
+    rows: List[Dict[str, Any]],
+) -> None:
+    """
+    Deletes one row of a DuckDB table per identity in ``rows``, so that deleting one
+    of several identical rows of a table without a key leaves the others.
+    """
+    columns = [column for column in rows[0] if column in column_types]
+    if not columns:
+        raise RuntimeError(f"No imported replica identity columns in {table_name}")
+    casts = ", ".join(
+        f'CAST("{column}" AS {column_types[column]}) AS "{column}"'
+        for column in columns
+    )
+    partition = ", ".join(f't."{column}"' for column in columns)
+    join = " AND ".join(
+        f't."{column}" IS NOT DISTINCT FROM d."{column}"' for column in columns
+    )
+    _register_rows(conn, rows, columns)
+    try:
+        conn.execute(
+            f"""
+            DELETE FROM "{table_name}"
+            WHERE rowid IN (
+                SELECT row_id
+                FROM (
+                    SELECT
+                        t.rowid AS row_id,
+                        d.deletes,
+                        row_number() OVER (PARTITION BY {partition}) AS n
+                    FROM "{table_name}" t
+                    JOIN (
+                        SELECT {casts}, COUNT(*) AS deletes
+                        FROM cdc_rows
+                        GROUP BY ALL
+                    ) d ON {join}
+                ) AS matches
+                WHERE n <= deletes
+            );
+            """
+        )
+    finally:
+        conn.unregister("cdc_rows")
 
-    logging.info(f"Dropping existing table: {table_name} (if exists)...")
-    conn.execute(f"DROP TABLE IF EXISTS {safe_table_name};")
 
-    cmd = f"""
-        CREATE TABLE {safe_table_name} AS
-        SELECT * FROM postgres_db.{table_name};
+def _insert_rows(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    column_types: Dict[str, str],
+    rows: List[Dict[str, Any]],
+) -> None:
+    """
+    Inserts rows of text values into a DuckDB table, cast to its column types.
+    Columns the table does not have, such as columns outside its projection, are
+    left out.
     """
+    columns = [column for column in rows[0] if column in column_types]
+    casts = ", ".join(
+        f'CAST("{column}" AS {column_types[column]}) AS "{column}"'
+        for column in columns
+    )
+    _register_rows(conn, rows, columns)
+    try:
+        conn.execute(
+            f'INSERT INTO "{table_name}" BY NAME SELECT {casts} FROM cdc_rows;'
+        )
+    finally:
+        conn.unregister("cdc_rows")
 
+
+def apply_change_batch(
+    conn: duckdb.DuckDBPyConnection, batch: ChangeBatch, slot_name: str
+) -> None:
+    """
+    Applies a micro-batch to the DuckDB tables and stores its end LSN, in a single
+    transaction: the batch is either applied together with its LSN or not at all.
+    """
+    conn.execute("BEGIN TRANSACTION;")
     try:
-        conn.execute(cmd)
-        logging.info(f"Successfully imported table: {table_name}")
-    except duckdb.Error as e:
-        logging.error(f"Error importing table {table_name}: {e}")
-        raise RuntimeError(f"Error importing table {table_name}: {e}")
+        for table_name, segments in batch["tables"].items():
+            column_types = dict(
+                conn.execute(
+                    """
+                    SELECT column_name, data_type
+                    FROM information_schema.columns
+                    WHERE table_catalog = current_database()
+                      AND table_schema = 'main'
+                      AND table_name = ?
+                    """,
+                    (table_name,),
+                ).fetchall()
+            )
+            if not column_types:
+                raise RuntimeError(f"Table {table_name} does not exist in DuckDB")
+            for segment in segments:
+                if segment["truncate"]:
+                    conn.execute(f'DELETE FROM "{table_name}";')
+                if segment["deletes"]:
+                    _delete_rows(conn, table_name, column_types, segment["deletes"])
+                if segment["inserts"]:
+                    _insert_rows(conn, table_name, column_types, segment["inserts"])
+        set_cdc_lsn(conn, slot_name, batch["end_lsn"])
+        conn.execute("COMMIT;")
+    except Exception:
+        conn.execute("ROLLBACK;")
+        raise
+
+
+def flush_change_batch(
+    duckdb_config: Dict[str, Any], batch: ChangeBatch, slot_name: str
+) -> bool:
+    """
+    Applies a micro-batch over a connection opened for this write only, so that dbt,
+    batch imports and dashboard snapshots can use the DuckDB file between batches.
+    Returns False, keeping the batch, if another process has the file open.
+    """
+    try:
+        conn = connect_duckdb(duckdb_config)
+    except duckdb.IOException as e:
+        logging.info(f"DuckDB database is busy, retrying the batch later: {e}")
+        return False
+    try:
+        apply_change_batch(conn, batch, slot_name)
+    finally:
+        conn.close()
+    logging.info(
+        f"Applied {batch['changes']} changes up to LSN {format_lsn(batch['end_lsn'])}"
+    )
+    return True
+
+
+def prepare_publication(
+    postgres_config: Dict[str, str], publication: str, tables: List[str]
+) -> None:
+    """
+    Creates the publication of the tables to stream, or resets its table list to
+    them. Tables without a primary key are switched to ``REPLICA IDENTITY FULL``:
+    PostgreSQL rejects updates and deletes on published tables without a replica
+    identity, and the full old row is what identifies the changed row in DuckDB.
+    """
+    pg_conn = connect_postgres(postgres_config)
+    try:
+        with pg_conn.cursor() as pg_cursor:
+            for table_name in tables:
+                pg_cursor.execute(
+                    """
+                    SELECT
+                        c.relreplident,
+                        EXISTS (
+                            SELECT 1 FROM pg_index i
+                            WHERE i.indrelid = c.oid AND i.indisprimary
+                        )
+                    FROM pg_class c
+                    WHERE c.oid = %s::regclass;
+                    """,
+                    (table_name,),
+                )
+                replica_identity, has_primary_key = pg_cursor.fetchone()
+                if replica_identity == "n" or (
+                    replica_identity == "d" and not has_primary_key
+                ):
+                    logging.info(f"Setting REPLICA IDENTITY FULL on {table_name}...")
+                    pg_cursor.execute(
+                        f"ALTER TABLE {table_name} REPLICA IDENTITY FULL;"
+                    )
+
+            pg_cursor.execute(
+                "SELECT COUNT(*) FROM pg_publication WHERE pubname = %s;",
+                (publication,),
+            )
+            table_list = ", ".join(tables)
+            if pg_cursor.fetchone()[0]:
+                pg_cursor.execute(
+                    f"ALTER PUBLICATION {publication} SET TABLE {table_list};"
+                )
+            else:
+                pg_cursor.execute(
+                    f"CREATE PUBLICATION {publication} FOR TABLE {table_list};"
+                )
+        pg_conn.commit()
+    finally:
+        pg_conn.close()
+
+
+def snapshot_tables(
+    config: Dict[str, Any], slot_name: str, replication_cursor: Any
+) -> int:
+    """
+    Creates the replication slot and loads every table of the import spec in full,
+    in the snapshot exported with the slot, so that the stream continues exactly
+    where the loaded rows end. A leftover slot without an applied LSN in DuckDB is
+    dropped first. The tables are streamed with ``COPY`` and swapped in together,
+    and their incremental high-water marks are dropped, as they no longer describe
+    the loaded tables. Returns the LSN the stream starts at.
+
+    The slot's snapshot stays valid as long as the replication connection is not
+    used for anything else, so it is only used again to start streaming.
+    """
+    postgres_config: Dict[str, str] = config["postgres"]
+    tables: Dict[str, Dict[str, Any]] = config["tables"]
+
+    pg_conn = connect_postgres(postgres_config)
+    try:
+        pg_conn.autocommit = True
+        with pg_conn.cursor() as pg_cursor:
+            pg_cursor.execute(
+                "SELECT pg_drop_replication_slot(slot_name) "
+                "FROM pg_replication_slots WHERE slot_name = %s;",
+                (slot_name,),
+            )
+    finally:
+        pg_conn.close()
+
+    logging.info(f"Creating replication slot {slot_name}...")
+    replication_cursor.execute(
+        f"CREATE_REPLICATION_SLOT {slot_name} LOGICAL pgoutput EXPORT_SNAPSHOT;"
+    )
+    _, consistent_point, snapshot, _ = replication_cursor.fetchone()
+    start_lsn = parse_lsn(consistent_point)
+
+    conn = connect_duckdb(config["duckdb"])
+    try:
+        conn.execute("INSTALL postgres;")
+        conn.execute("LOAD postgres;")
+        create_and_attach_secret(
+            conn,
+            config["duckdb"].get("secret_name", "postgres_secret"),
+            postgres_config,
+        )
+        ensure_state_table(conn)
+        ensure_cdc_state_table(conn)
+
+        loads = []
+        try:
+            for table_name, settings in tables.items():
+                copy_config = {
+                    "postgres_config": postgres_config,
+                    "batch_bytes": settings.get("batch_bytes", COPY_BATCH_BYTES),
+                    "snapshot": snapshot,
+                }
+                loads.append(
+                    import_table(
+                        conn,
+                        table_name,
+                        None,
+                        settings.get("partition_column"),
+                        settings.get("parallelism", 1),
+                        copy_config,
+                        settings.get("columns"),
+                        settings.get("sort_by"),
+                    )
+                )
+        except Exception:
+            drop_staged_tables(conn, loads)
+            raise
+        swap_tables(conn, loads)
+
+        conn.execute("BEGIN TRANSACTION;")
+        conn.execute(
+            f"DELETE FROM {STATE_TABLE} WHERE table_name IN "
+            f"({', '.join('?' for _ in tables)});",
+            tuple(tables),
+        )
+        set_cdc_lsn(conn, slot_name, start_lsn)
+        conn.execute("COMMIT;")
+    finally:
+        conn.close()
+
+    logging.info(f"Loaded snapshot of {len(tables)} tables at LSN {consistent_point}")
+    return start_lsn
+
+
+def stream_changes(
+    replication_cursor: Any,
+    duckdb_config: Dict[str, Any],
+    slot_name: str,
+    applied_lsn: int,
+    batch_seconds: float,
+    batch_changes: int,
+) -> None:
+    """
+    Consumes the replication slot and applies its changes to DuckDB in micro-batches
+    of whole transactions, every ``batch_seconds`` or ``batch_changes`` changes.
+
+    Every batch is applied together with its end LSN (see ``apply_change_batch``), and
+    only then confirmed to PostgreSQL, which may then recycle the WAL before it. After
+    a crash PostgreSQL resends from the last confirmed LSN, and transactions that
+    committed before the LSN stored in DuckDB are skipped, so every change is applied
+    exactly once. While DuckDB is busy, the batch is kept and retried at most every
+    ``CDC_POLL_SECONDS``, however many transactions commit meanwhile; once it is full,
+    the stream stops being read and the changes wait in the slot.
+    """
+    relations: Dict[int, Relation] = {}
+    batch = new_change_batch()
+    confirmed_lsn = applied_lsn
+    in_transaction = skipping = False
+
+    while True:
+        message = None
+        if in_transaction or batch["changes"] < batch_changes:
+            message = replication_cursor.read_message()
+
+        if message is not None:
+            change = decode_pgoutput(message.payload, relations)
+            if change is None:
+                continue
+            if change["type"] == "begin":
+                in_transaction = True
+                skipping = change["lsn"] < applied_lsn
+                continue
+            if change["type"] != "commit":
+                if not skipping:
+                    add_change(batch, change)
+                continue
+            in_transaction = False
+            if not skipping and batch["changes"]:
+                batch["end_lsn"] = change["end_lsn"]
+
+        if not in_transaction and batch["end_lsn"] is not None:
+            now = time.monotonic()
+            due = batch["changes"] >= batch_changes or (
+                now - batch["started_at"] >= batch_seconds
+            )
+            if batch["retry_at"] is not None and now < batch["retry_at"]:
+                due = False
+            if due and flush_change_batch(duckdb_config, batch, slot_name):
+                applied_lsn = confirmed_lsn = batch["end_lsn"]
+                replication_cursor.send_feedback(flush_lsn=confirmed_lsn)
+                batch = new_change_batch()
+            elif due:
+                batch["retry_at"] = now + CDC_POLL_SECONDS
+
+        if message is None:
+            if not in_transaction and batch["end_lsn"] is None:
+                # Nothing pending: the WAL read so far only held other changes.
+                if replication_cursor.wal_end > confirmed_lsn:
+                    confirmed_lsn = replication_cursor.wal_end
+                    replication_cursor.send_feedback(flush_lsn=confirmed_lsn)
+            if batch["changes"] >= batch_changes and not in_transaction:
+                time.sleep(CDC_POLL_SECONDS)
+                replication_cursor.send_feedback()
+            else:
+                select.select([replication_cursor], [], [], CDC_POLL_SECONDS)
+
+
+def run_cdc(config: Dict[str, Any]) -> None:
+    """
+    Keeps the tables of the import spec in sync with PostgreSQL through logical
+    replication, until interrupted.
+
+    On first start, or when the replication slot is gone, every table is loaded
+    from a snapshot taken with the slot (see ``snapshot_tables``). The stream then
+    resumes from the LSN stored in DuckDB (see ``stream_changes``).
+    """
+    cdc_config = {**CDC_DEFAULTS, **config.get("cdc", {})}
+    postgres_config: Dict[str, str] = config["postgres"]
+    slot_name: str = cdc_config["slot_name"]
+    publication: str = cdc_config["publication"]
+
+    prepare_publication(postgres_config, publication, list(config["tables"]))
+
+    conn = connect_duckdb(config["duckdb"])
+    try:
+        ensure_cdc_state_table(conn)
+        applied_lsn = get_cdc_lsn(conn, slot_name)
+    finally:
+        conn.close()
+
+    pg_conn = connect_postgres(postgres_config)
+    try:
+        with pg_conn.cursor() as pg_cursor:
+            pg_cursor.execute(
+                "SELECT COUNT(*) FROM pg_replication_slots WHERE slot_name = %s;",
+                (slot_name,),
+            )
+            slot_exists = pg_cursor.fetchone()[0] > 0
+    finally:
+        pg_conn.close()
+
+    replication_conn = connect_postgres(
+        postgres_config, psycopg2.extras.LogicalReplicationConnection
+    )
+    try:
+        replication_cursor = replication_conn.cursor()
+        if applied_lsn is None or not slot_exists:
+            if applied_lsn is not None:
+                logging.warning(
+                    f"Replication slot {slot_name} is gone, reloading every table..."
+                )
+            applied_lsn = snapshot_tables(config, slot_name, replication_cursor)
+
+        logging.info(
+            f"Streaming changes of {publication} from LSN {format_lsn(applied_lsn)}..."
+        )
+        replication_cursor.start_replication(
+            slot_name=slot_name,
+            decode=False,
+            start_lsn=applied_lsn,
+            status_interval=10,
+            options={"proto_version": "1", "publication_names": publication},
+        )
+        stream_changes(
+            replication_cursor,
+            config["duckdb"],
+            slot_name,
+            applied_lsn,
+            cdc_config["batch_seconds"],
+            cdc_config["batch_changes"],
+        )
+    finally:
+        replication_conn.close()
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parses the command line arguments of the importer.
+    """
+    parser = argparse.ArgumentParser(
+        description="Import tables from PostgreSQL into DuckDB."
+    )
+    parser.add_argument(
+        "--config",
+        default=CONFIG_PATH,
+        help="TOML import spec (default is import_config.toml next to this script).",
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Reload every table from scratch instead of syncing incrementally.",
+    )
+    parser.add_argument(
+        "--cdc",
+        action="store_true",
+        help=(
+            "Keep streaming changes through logical replication instead of importing "
+            "once; the first run loads every table from the replication snapshot."
+        ),
+    )
+    return parser.parse_args()
 
 
 def main() -> None:
     """
-    Main function to import tables from PostgreSQL to DuckDB, ensuring atomic reload.
+    Main function to import tables from PostgreSQL to DuckDB, as described by the
+    import spec.
+
+    Every table is first loaded into a shadow or delta table; tables with the
+    incremental strategy are synced from their high-water mark, the remaining tables,
+    and every table when ``--full-refresh`` is given, are reloaded in full. Once all
+    loads succeed they are swapped into place in a single transaction. Exits with
+    status 1 if the spec is invalid or any table fails, so that dbt does not run on
+    a partial import.
+
+    With ``--cdc`` the tables are kept in sync through logical replication instead
+    (see ``run_cdc``), until interrupted.
     """
+    args = parse_args()
     logging.info("Starting PostgreSQL to DuckDB import process...")
 
-    postgres_config: Dict[str, str] = {
-        "host": "poplin-postgres",
-        "port": 5432,
-        "database": "poplin-store",
-        "user": "postgres",
-        "password": "secretpassword",
-    }
+    try:
+        config = load_config(args.config)
+    except (OSError, tomllib.TOMLDecodeError, ValueError) as e:
+        logging.error(f"Invalid import spec {args.config}: {e}")
+        sys.exit(1)
 
-    duckdb_path: str = "/app/analytics.duckdb"
-    secret_name: str = "postgres_secret"
-    tables: List[str] = ["orders", "returns", "managers"]
+    if args.cdc:
+        try:
+            run_cdc(config)
+        except KeyboardInterrupt:
+            logging.info("Change stream stopped.")
+        except Exception as e:
+            logging.error(f"Change stream failed: {e}")
+            sys.exit(1)
+        return
 
-    conn = duckdb.connect(duckdb_path)
+    postgres_config: Dict[str, str] = config["postgres"]
+    secret_name: str = config["duckdb"].get("secret_name", "postgres_secret")
+    tables: Dict[str, Dict[str, Any]] = config["tables"]
+    table_parallelism: int = config["duckdb"].get("table_parallelism", len(tables))
+
+    conn = connect_duckdb(config["duckdb"])
 
     try:
         logging.info("Installing and loading DuckDB PostgreSQL extension...")
@@ -114,15 +1719,33 @@ def main() -> None:
         conn.execute("LOAD postgres;")
 
         create_and_attach_secret(conn, secret_name, postgres_config)
-        drop_all_tables(conn)
+        ensure_state_table(conn)
+
+        with ThreadPoolExecutor(max_workers=table_parallelism) as executor:
+            futures = [
+                executor.submit(
+                    sync_table,
+                    conn,
+                    table,
+                    settings,
+                    args.full_refresh,
+                    postgres_config,
+                )
+                for table, settings in tables.items()
+            ]
+            loads = [future.result() for future in futures if not future.exception()]
+            failures = [future.exception() for future in futures if future.exception()]
 
-        for table in tables:
-            import_table(conn, table)
+        if failures:
+            drop_staged_tables(conn, loads)
+            raise failures[0]
 
+        swap_tables(conn, loads)
         logging.info("Data import completed successfully.")
 
     except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
+        logging.error(f"Data import failed: {e}")
+        sys.exit(1)
 
     finally:
         logging.info("Closing DuckDB connection.")
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import threading
+
+import duckdb
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "dashboard"))
+
+import queries  # noqa: E402
+
+# Appends a row to the warehouse, as the importer or dbt would.
+WRITER = "import duckdb, sys; duckdb.connect(sys.argv[1]).execute('INSERT INTO t VALUES (2)')"
+
+
+def write_from_another_process(path: str) -> bool:
+    """
+    Returns whether another process could open the file for writing and write to it.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", WRITER, path], capture_output=True, timeout=60
+    )
+    return result.returncode == 0
+
+
+@pytest.fixture
+def live_pool(tmp_path, monkeypatch):
+    """
+    Serves queries from a fresh warehouse file through a pool on the live file.
+    """
+    path = str(tmp_path / "analytics.duckdb")
+    conn = duckdb.connect(path)
+    conn.execute("CREATE TABLE t AS SELECT 1 AS x;")
+    conn.close()
+    pool = queries.ConnectionPool(path, {"threads": 1})
+    monkeypatch.setattr(queries, "_connection_pool", pool)
+    monkeypatch.setattr(queries, "_query_cache", queries.QueryCache(8, 60))
+    return pool
+
+
+def test_query_keeps_its_lock_while_the_refresher_copies(live_pool, tmp_path):
+    snapshot_dir = tmp_path / "snapshots"
+    snapshot_dir.mkdir()
+    refresher = queries.WarehouseRefresher(live_pool.db_path, str(snapshot_dir))
+
+    with live_pool.borrow(live_pool.warehouse_version()) as cursor:
+        refresh = threading.Thread(target=refresher.refresh)
+        refresh.start()
+        refresh.join(1)
+        # The refresher waits for the query instead of dropping its lock.
+        assert refresh.is_alive()
+        assert not write_from_another_process(live_pool.db_path)
+        assert cursor.execute("SELECT COUNT(*) FROM t;").fetchone() == (1,)
+    refresh.join()
+
+    assert refresher.version is not None
+    assert queries._connection_pool is not live_pool
+
+
+def test_concurrent_queries_share_one_lock(live_pool):
+    version = live_pool.warehouse_version()
+    with live_pool.borrow(version):
+        with live_pool.borrow(version):
+            pass
+        # The inner query finishing must not release the outer one's lock.
+        assert not write_from_another_process(live_pool.db_path)
+    assert write_from_another_process(live_pool.db_path)